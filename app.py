@@ -1,58 +1,140 @@
 from flask import Flask
 from flask_login import LoginManager
-from models import db, Admin
-from utils import get_settings
+from werkzeug.middleware.proxy_fix import ProxyFix
+from models import db
+from utils import get_settings, responsive_image, asset_url, rgb_channels
 from routes import register_routes
+from commands import register_commands
+from ingest import contact_ingest
+from compression import register_compression
+from templating import init_templating
+from database import init_database
+from metrics import init_metrics
+from security import principal_cache
+from purge import init_purge
+from cache import init_cache
 import os
+import time
+from datetime import datetime, timezone
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'bellari-secret-key-2025')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db.init_app(app)
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'admin_login'
 
 @login_manager.user_loader
 def load_user(user_id):
-    return Admin.query.get(int(user_id))
-
-@app.context_processor
-def inject_settings():
-    return {'settings': get_settings()}
-
-with app.app_context():
-    db.create_all()
-    
-    if not Admin.query.first():
-        admin = Admin(username='admin')
-        admin.set_password('admin123')
-        db.session.add(admin)
-        db.session.commit()
-    
-    from models import SiteSettings
-    if not SiteSettings.query.first():
-        db.session.add(SiteSettings())
-        db.session.commit()
-    
-    from models import Service
-    if not Service.query.first():
-        from utils import generate_random_image
-        services_data = [
-            {'title': 'Nettoyage Fin de Chantier', 'description': 'Service spécialisé dans le nettoyage après travaux. Éliminez tous les débris, poussières et résidus de chantier pour une livraison parfaite.', 'icon': 'hard-hat', 'featured': True, 'order': 1},
-            {'title': 'Nettoyage d\'Appartements', 'description': 'Entretien professionnel de vos appartements avec produits de qualité. Service complet pour un logement impeccable.', 'icon': 'home', 'featured': True, 'order': 2},
-            {'title': 'Nettoyage de Bureau', 'description': 'Maintien d\'un environnement de travail propre et professionnel. Service régulier ou occasionnel pour vos bureaux.', 'icon': 'building-2', 'featured': True, 'order': 3},
-            {'title': 'Nettoyage Fin d\'Événement', 'description': 'Nettoyage complet après événements. Remise en état rapide et efficace des lieux après vos festivités.', 'icon': 'sparkles', 'order': 4},
-        ]
-        for data in services_data:
-            image = generate_random_image(filename=f"service_{data['title'].lower().replace(' ', '_')}.jpg")
-            service = Service(**data, image=image)
-            db.session.add(service)
-        db.session.commit()
-
-register_routes(app)
+    return principal_cache.get(int(user_id))
+
+def create_app(overrides=None):
+    started = time.perf_counter()
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'bellari-secret-key-2025')
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+    app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+    app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    app.config['DB_POOL_PRE_PING'] = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+    app.config['DB_REPLICA_URLS'] = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    app.config['DB_REPLICA_MAX_LAG'] = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+    app.config['DB_REPLICA_CHECK_INTERVAL'] = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 2))
+    app.config['DB_REPLICA_PIN_SECONDS'] = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 15))
+    app.config['DB_PGBOUNCER'] = os.environ.get('DB_PGBOUNCER', '') == '1'
+    app.config['DB_STATEMENT_TIMEOUT_PUBLIC'] = int(os.environ.get('DB_STATEMENT_TIMEOUT_PUBLIC', 2000))
+    app.config['DB_STATEMENT_TIMEOUT_ADMIN'] = int(os.environ.get('DB_STATEMENT_TIMEOUT_ADMIN', 30000))
+    app.config['PAGE_CACHE_TTL'] = int(os.environ.get('PAGE_CACHE_TTL', 300))
+    app.config['PAGE_CACHE_MAX_ENTRIES'] = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 256))
+    app.config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND', 'memory')
+    app.config['CACHE_DIR'] = os.environ.get('CACHE_DIR', os.path.join(app.instance_path, 'cache'))
+    app.config['CACHE_REDIS_URL'] = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    app.config['CACHE_BROADCAST'] = os.environ.get('CACHE_BROADCAST', 'auto')
+    app.config['CACHE_POLL_INTERVAL'] = float(os.environ.get('CACHE_POLL_INTERVAL', 0.5))
+    app.config['MESSAGES_PER_PAGE'] = int(os.environ.get('MESSAGES_PER_PAGE', 50))
+    app.config['CONTACT_RATE'] = float(os.environ.get('CONTACT_RATE', 1 / 60))
+    app.config['CONTACT_BURST'] = int(os.environ.get('CONTACT_BURST', 3))
+    app.config['CONTACT_BATCH_SIZE'] = int(os.environ.get('CONTACT_BATCH_SIZE', 50))
+    app.config['CONTACT_FLUSH_INTERVAL'] = float(os.environ.get('CONTACT_FLUSH_INTERVAL', 2))
+    app.config['CONTACT_SPOOL'] = os.environ.get('CONTACT_SPOOL', os.path.join(app.instance_path, 'contact_spool.jsonl'))
+    app.config['IMAGE_WORKERS'] = int(os.environ.get('IMAGE_WORKERS', 2))
+    app.config['IMAGE_JOB_STALE'] = int(os.environ.get('IMAGE_JOB_STALE', 300))
+    app.config['STATIC_SENDFILE'] = os.environ.get('STATIC_SENDFILE', '')
+    app.config['STATIC_ACCEL_PREFIX'] = os.environ.get('STATIC_ACCEL_PREFIX', '/_static/')
+    app.config['USE_X_SENDFILE'] = app.config['STATIC_SENDFILE'] == 'x-sendfile'
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
+    app.config['COMPRESS_BROTLI_QUALITY'] = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+    app.config['TEMPLATE_CACHE_DIR'] = os.environ.get('TEMPLATE_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache'))
+    app.config['TEMPLATE_PROFILE'] = os.environ.get('TEMPLATE_PROFILE', '') == '1'
+    app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', '1') == '1'
+    app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 250))
+    app.config['SLOW_QUERY_LOG'] = os.environ.get('SLOW_QUERY_LOG', os.path.join(app.instance_path, 'slow_queries.log'))
+    app.config['PRINCIPAL_TTL'] = int(os.environ.get('PRINCIPAL_TTL', 60))
+    app.config['LOGIN_IP_RATE'] = float(os.environ.get('LOGIN_IP_RATE', 10 / 60))
+    app.config['LOGIN_IP_BURST'] = int(os.environ.get('LOGIN_IP_BURST', 20))
+    app.config['LOGIN_USER_RATE'] = float(os.environ.get('LOGIN_USER_RATE', 1 / 30))
+    app.config['LOGIN_USER_BURST'] = int(os.environ.get('LOGIN_USER_BURST', 5))
+    app.config['FREEZE_DIR'] = os.environ.get('FREEZE_DIR', os.path.join(app.instance_path, 'site'))
+    app.config['FREEZE_BASE_URL'] = os.environ.get('FREEZE_BASE_URL', 'http://localhost')
+    app.config['FREEZE_KEEP'] = int(os.environ.get('FREEZE_KEEP', 3))
+    app.config['FREEZE_AUTO'] = os.environ.get('FREEZE_AUTO', '') == '1'
+    app.config['FREEZE_DELAY'] = float(os.environ.get('FREEZE_DELAY', 2))
+    app.config['PROXY_MAX_AGE'] = int(os.environ.get('PROXY_MAX_AGE', 0))
+    app.config['PURGE_URL'] = os.environ.get('PURGE_URL', '')
+    app.config['PURGE_METHOD'] = os.environ.get('PURGE_METHOD', 'POST')
+    app.config['PURGE_TOKEN'] = os.environ.get('PURGE_TOKEN')
+    app.config['STARTED_AT'] = datetime.now(timezone.utc).replace(microsecond=0)
+    app.config['OUTBOX_TRANSPORT'] = os.environ.get('OUTBOX_TRANSPORT', 'auto')
+    app.config['OUTBOX_FAKE_LOG'] = os.environ.get('OUTBOX_FAKE_LOG', os.path.join(app.instance_path, 'outbox_fake.jsonl'))
+    app.config['OUTBOX_BATCH_SIZE'] = int(os.environ.get('OUTBOX_BATCH_SIZE', 20))
+    app.config['OUTBOX_POLL_INTERVAL'] = float(os.environ.get('OUTBOX_POLL_INTERVAL', 2))
+    app.config['OUTBOX_MAX_ATTEMPTS'] = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+    app.config['OUTBOX_BACKOFF_BASE'] = float(os.environ.get('OUTBOX_BACKOFF_BASE', 30))
+    app.config['OUTBOX_BACKOFF_MAX'] = float(os.environ.get('OUTBOX_BACKOFF_MAX', 3600))
+    app.config['OUTBOX_LEASE'] = int(os.environ.get('OUTBOX_LEASE', 60))
+    app.config['NOTIFY_WHATSAPP_TO'] = os.environ.get('NOTIFY_WHATSAPP_TO', '')
+    app.config['NOTIFY_EMAIL_TO'] = os.environ.get('NOTIFY_EMAIL_TO', '')
+    app.config['WHATSAPP_API_URL'] = os.environ.get('WHATSAPP_API_URL', 'https://graph.facebook.com/v19.0')
+    app.config['WHATSAPP_PHONE_ID'] = os.environ.get('WHATSAPP_PHONE_ID', '')
+    app.config['WHATSAPP_TOKEN'] = os.environ.get('WHATSAPP_TOKEN', '')
+    app.config['SMTP_HOST'] = os.environ.get('SMTP_HOST', '')
+    app.config['SMTP_PORT'] = int(os.environ.get('SMTP_PORT', 587))
+    app.config['SMTP_USER'] = os.environ.get('SMTP_USER', '')
+    app.config['SMTP_PASSWORD'] = os.environ.get('SMTP_PASSWORD', '')
+    app.config['SMTP_FROM'] = os.environ.get('SMTP_FROM', 'notifications@localhost')
+    app.config['SMTP_STARTTLS'] = os.environ.get('SMTP_STARTTLS', '1') == '1'
+    app.config['BOOTSTRAP_LOCK'] = os.environ.get('BOOTSTRAP_LOCK', os.path.join(app.instance_path, 'bootstrap.lock'))
+    app.config.update(overrides or {})
+
+    proxy_hops = int(os.environ.get('PROXY_HOPS', 0))
+    if proxy_hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops, x_proto=1, x_host=1)
+
+    init_templating(app)
+    init_database(app)
+    db.init_app(app)
+    contact_ingest.init_app(app)
+    login_manager.init_app(app)
+    init_metrics(app)
+    init_purge(app)
+    init_cache(app)
+
+    @app.context_processor
+    def inject_settings():
+        return {'settings': get_settings()}
+
+    app.jinja_env.globals['responsive_image'] = responsive_image
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.jinja_env.filters['rgb_channels'] = rgb_channels
+
+    register_routes(app)
+    register_commands(app)
+    register_compression(app)
+
+    app.config['STARTUP_SECONDS'] = time.perf_counter() - started
+    app.logger.info('Application prête en %.0f ms', app.config['STARTUP_SECONDS'] * 1000)
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,191 @@
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import subprocess
+import tempfile
+import urllib.request
+
+ASSETS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(ASSETS_DIR)
+TEMPLATES_DIR = os.path.join(ROOT_DIR, 'templates')
+FONTS_DIR = os.path.join(ASSETS_DIR, 'fonts')
+DIST = 'dist'
+
+TAILWIND_VERSION = 'v3.4.17'
+POPPINS_URL = 'https://github.com/google/fonts/raw/main/ofl/poppins/{name}.ttf'
+POPPINS_WEIGHTS = {300: 'Poppins-Light', 400: 'Poppins-Regular', 500: 'Poppins-Medium', 600: 'Poppins-SemiBold', 700: 'Poppins-Bold'}
+# Latin, Latin-1, Œ/œ, ponctuation typographique et €: tout le texte français saisi dans l'admin.
+POPPINS_UNICODES = list(range(0x20, 0x7F)) + list(range(0xA0, 0x100)) + [0x152, 0x153, 0x178, 0x2C6, 0x2DC] + list(range(0x2013, 0x2027)) + [0x2039, 0x203A, 0x20AC]
+
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^.]+$')
+COMPRESSIBLE = {'.css', '.js', '.json', '.svg', '.txt', '.xml', '.html', '.ico'}
+
+ICON_PATTERN = re.compile(r'\bfa-([a-z0-9-]+)')
+ICON_RULE = re.compile(r'([^{}]+)\{\s*content:\s*"\\([0-9a-f]+)"')
+ICON_SELECTOR = re.compile(r'\.fa-([a-z0-9-]+)::?before')
+
+def fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+def write_fingerprinted(static_folder, logical, data, manifest):
+    stem, ext = os.path.splitext(logical)
+    name = f'{stem}.{fingerprint(data)}{ext}'
+    path = os.path.join(static_folder, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as output:
+        output.write(data)
+    manifest[logical] = name
+    return name
+
+def minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    return re.sub(r'\s*([{}:;,>])\s*', r'\1', css).replace(';}', '}').strip()
+
+def used_icons():
+    icons = set()
+    for path in glob.glob(os.path.join(TEMPLATES_DIR, '**', '*.html'), recursive=True):
+        with open(path, encoding='utf-8') as template:
+            icons.update(ICON_PATTERN.findall(template.read()))
+    return icons
+
+def build_tailwind():
+    env = dict(os.environ)
+    env.setdefault('TAILWINDCSS_VERSION', TAILWIND_VERSION)
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, 'tailwind.css')
+        subprocess.run([
+            env.get('TAILWIND_BIN', 'tailwindcss'),
+            '-c', os.path.join(ASSETS_DIR, 'tailwind.config.js'),
+            '-i', os.path.join(ASSETS_DIR, 'app.css'),
+            '-o', output, '--minify',
+        ], check=True, env=env)
+        with open(output, encoding='utf-8') as css:
+            return css.read()
+
+def subset_font(source, unicodes):
+    from fontTools import subset
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.drop_tables += ['DSIG']
+    options.name_IDs = []
+    font = subset.load_font(source, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=unicodes)
+    subsetter.subset(font)
+    with tempfile.NamedTemporaryFile(suffix='.woff2') as output:
+        subset.save_font(font, output.name, options)
+        return output.read()
+
+def poppins_source(name):
+    path = os.path.join(FONTS_DIR, f'{name}.ttf')
+    if not os.path.exists(path):
+        os.makedirs(FONTS_DIR, exist_ok=True)
+        urllib.request.urlretrieve(POPPINS_URL.format(name=name), path)
+    return path
+
+def build_poppins(static_folder, manifest):
+    rules = []
+    for weight, name in POPPINS_WEIGHTS.items():
+        data = subset_font(poppins_source(name), POPPINS_UNICODES)
+        filename = write_fingerprinted(static_folder, f'{DIST}/fonts/poppins-{weight}.woff2', data, manifest)
+        rules.append(
+            "@font-face{font-family:'Poppins';font-style:normal;font-weight:%d;font-display:swap;"
+            "src:url('%s') format('woff2')}" % (weight, os.path.relpath(filename, DIST))
+        )
+    return ''.join(rules)
+
+def build_icons(static_folder, manifest):
+    import fontawesomefree
+    root = os.path.join(os.path.dirname(fontawesomefree.__file__), 'static', 'fontawesomefree')
+    with open(os.path.join(root, 'css', 'all.css'), encoding='utf-8') as css:
+        codepoints = {}
+        for selectors, codepoint in ICON_RULE.findall(css.read()):
+            for icon in ICON_SELECTOR.findall(selectors):
+                codepoints.setdefault(icon, codepoint)
+    icons = sorted(icon for icon in used_icons() if icon in codepoints)
+    unicodes = [int(codepoints[icon], 16) for icon in icons]
+
+    rules = []
+    for family, weight, source in (('Font Awesome 6 Free', 900, 'fa-solid-900'), ('Font Awesome 6 Brands', 400, 'fa-brands-400')):
+        data = subset_font(os.path.join(root, 'webfonts', f'{source}.ttf'), unicodes)
+        filename = write_fingerprinted(static_folder, f'{DIST}/fonts/{source}.woff2', data, manifest)
+        rules.append(
+            "@font-face{font-family:'%s';font-style:normal;font-weight:%d;font-display:block;"
+            "src:url('%s') format('woff2')}" % (family, weight, os.path.relpath(filename, DIST))
+        )
+    with open(os.path.join(ASSETS_DIR, 'icons.css'), encoding='utf-8') as css:
+        rules.append(css.read())
+    rules.extend('.fa-%s:before{content:"\\%s"}' % (icon, codepoints[icon]) for icon in icons)
+    return ''.join(rules), icons
+
+def fingerprint_static(static_folder, manifest):
+    sources = []
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.relpath(root, static_folder).split(os.sep)[0] == DIST:
+            dirs[:] = []
+            continue
+        for name in files:
+            path = os.path.join(root, name)
+            if HASHED_NAME.search(name) or name.endswith(('.gz', '.br')):
+                os.remove(path)
+            elif path != os.path.join(static_folder, 'manifest.json'):
+                sources.append(path)
+    for path in sources:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as source:
+            for chunk in iter(lambda: source.read(1 << 16), b''):
+                digest.update(chunk)
+        stem, ext = os.path.splitext(path)
+        target = f'{stem}.{digest.hexdigest()[:12]}{ext}'
+        try:
+            os.link(path, target)
+        except OSError:
+            with open(path, 'rb') as source, open(target, 'wb') as output:
+                output.write(source.read())
+        manifest[os.path.relpath(path, static_folder).replace(os.sep, '/')] = os.path.relpath(target, static_folder).replace(os.sep, '/')
+
+def precompress(static_folder, manifest):
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    count = 0
+    for filename in manifest.values():
+        if os.path.splitext(filename)[1] not in COMPRESSIBLE:
+            continue
+        path = os.path.join(static_folder, filename)
+        with open(path, 'rb') as source:
+            data = source.read()
+        with open(path + '.gz', 'wb') as output:
+            output.write(gzip.compress(data, 9, mtime=0))
+        if brotli:
+            with open(path + '.br', 'wb') as output:
+                output.write(brotli.compress(data, quality=11))
+        count += 1
+    return count
+
+def build(static_folder, css=True):
+    manifest = {}
+    icons = []
+    if not css:
+        try:
+            with open(os.path.join(static_folder, 'manifest.json')) as source:
+                manifest = {logical: name for logical, name in json.load(source).items() if logical.startswith(f'{DIST}/')}
+        except FileNotFoundError:
+            pass
+    else:
+        for path in glob.glob(os.path.join(static_folder, DIST, '**', '*.*'), recursive=True):
+            os.remove(path)
+        fonts = build_poppins(static_folder, manifest)
+        icons_css, icons = build_icons(static_folder, manifest)
+        styles = minify_css(fonts + icons_css) + build_tailwind()
+        write_fingerprinted(static_folder, f'{DIST}/app.css', styles.encode(), manifest)
+    fingerprint_static(static_folder, manifest)
+    precompress(static_folder, manifest)
+    with open(os.path.join(static_folder, 'manifest.json'), 'w') as output:
+        json.dump(manifest, output, indent=2, sort_keys=True)
+    return manifest, icons
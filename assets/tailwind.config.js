@@ -0,0 +1,13 @@
+const path = require('path');
+
+module.exports = {
+    content: [path.join(__dirname, '../templates/**/*.html')],
+    theme: {
+        extend: {
+            colors: {
+                primary: 'rgb(var(--color-primary) / <alpha-value>)',
+                accent: 'rgb(var(--color-accent) / <alpha-value>)',
+            },
+        },
+    },
+};
@@ -0,0 +1,235 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert
+from models import db, Service, Testimonial, ContactMessage, SiteImage
+from templating import percentiles
+from bootstrap import run_bootstrap
+from ingest import contact_ingest
+from cache import page_cache
+from broadcast import version_broadcast
+from database import replica_router
+from security import principal_cache
+import stats
+
+LATENCY_POINTS = (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+VOLUMES = {'messages': 5000, 'services': 40, 'testimonials': 40, 'images': 300}
+SKIPPED_ENDPOINTS = {'static', 'admin_logout'}
+EXTRA_CASES = [
+    ('admin_messages', {'status': 'unread'}),
+    ('admin_messages', {'status': 'read', 'date_from': '2025-01-01'}),
+]
+ADMIN_CREDENTIALS = {'username': 'admin', 'password': 'admin123'}
+
+BENCH_CONFIG = {
+    'DB_REPLICA_URLS': [],
+    'CACHE_BACKEND': 'memory',
+    'PURGE_URL': '',
+    'SLOW_QUERY_LOG': '',
+}
+
+@contextmanager
+def bench_app(database_url):
+    from app import create_app
+    singletons = (contact_ingest, page_cache, version_broadcast, replica_router, principal_cache)
+    saved = [(singleton, dict(vars(singleton))) for singleton in singletons]
+    try:
+        yield create_app({**BENCH_CONFIG, 'SQLALCHEMY_DATABASE_URI': database_url})
+    finally:
+        for singleton, state in saved:
+            vars(singleton).clear()
+            vars(singleton).update(state)
+
+def seed_volumes(volumes, seed=42):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    db.create_all()
+    db.session.execute(insert(Service), [{
+        'title': f'Service {i}',
+        'description': f'Description du service {i}. ' * 4,
+        'long_description': f'Présentation détaillée du service {i}. ' * 30,
+        'icon': 'broom',
+        'image': f'bench_service_{i}.jpg',
+        'featured': i < 6,
+        'order': i,
+    } for i in range(volumes['services'])])
+    db.session.execute(insert(Testimonial), [{
+        'name': f'Client {i}',
+        'content': 'Travail soigné et équipe ponctuelle. ' * 3,
+        'rating': rng.randint(3, 5),
+        'approved': rng.random() < 0.8,
+    } for i in range(volumes['testimonials'])])
+    db.session.execute(insert(ContactMessage), [{
+        'name': f'Contact {i}',
+        'email': f'contact{i}@example.com',
+        'phone': '+212600000000',
+        'subject': 'Demande de devis',
+        'message': 'Bonjour, je souhaite un devis pour le nettoyage de bureaux. ' * 3,
+        'created_at': now - timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+        'is_read': rng.random() < 0.7,
+    } for i in range(volumes['messages'])])
+    db.session.execute(insert(SiteImage), [{
+        'name': f'Image {i}',
+        'filename': f'bench_{i}.jpg',
+        'category': rng.choice(['hero', 'services', 'gallery', 'team']),
+        'alt_text': f'Image {i}',
+    } for i in range(volumes['images'])])
+    db.session.commit()
+    run_bootstrap()
+    stats.reconcile()
+    db.session.commit()
+
+def route_cases(app):
+    first_service = db.session.query(Service.id).order_by(Service.id).limit(1).scalar()
+    first_testimonial = db.session.query(Testimonial.id).order_by(Testimonial.id).limit(1).scalar()
+    arguments = {
+        'service_detail': {'id': first_service},
+        'admin_edit_service': {'id': first_service},
+        'admin_edit_testimonial': {'id': first_testimonial},
+        'admin_edit_seo': {'page': 'accueil'},
+    }
+    cases = []
+    with app.test_request_context():
+        from flask import url_for
+        for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+            if 'GET' not in rule.methods or rule.endpoint in SKIPPED_ENDPOINTS:
+                continue
+            if rule.arguments and rule.endpoint not in arguments:
+                continue
+            admin = rule.rule.startswith('/admin') and rule.endpoint != 'admin_login'
+            cases.append((rule.endpoint, url_for(rule.endpoint, **arguments.get(rule.endpoint, {})), admin))
+        for endpoint, args in EXTRA_CASES:
+            cases.append((f"{endpoint}?{'&'.join(sorted(args))}", url_for(endpoint, **args), True))
+    return cases
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self.count)
+
+    def count(self, *args):
+        self.local.count = getattr(self.local, 'count', 0) + 1
+
+    def take(self):
+        count = getattr(self.local, 'count', 0)
+        self.local.count = 0
+        return count
+
+def admin_session(app):
+    client = app.test_client()
+    response = client.post('/admin/login', data=ADMIN_CREDENTIALS)
+    if response.status_code != 302:
+        raise RuntimeError('Connexion admin impossible pour le benchmark')
+    return client.get_cookie(app.config['SESSION_COOKIE_NAME']).value
+
+def make_clients(app, session):
+    admin = app.test_client()
+    admin.set_cookie(app.config['SESSION_COOKIE_NAME'], session)
+    return {False: app.test_client(), True: admin}
+
+def timed_get(client, counter, url):
+    counter.take()
+    started = time.perf_counter()
+    response = client.get(url)
+    response.get_data()
+    elapsed = time.perf_counter() - started
+    if response.status_code >= 400:
+        raise RuntimeError(f'{url}: HTTP {response.status_code}')
+    return elapsed, counter.take()
+
+def summarize(latencies, queries, wall):
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / wall, 1) if wall else None,
+        'queries': round(sum(queries) / len(queries), 2),
+        **percentiles(latencies, LATENCY_POINTS),
+    }
+
+def run_routes(app, cases, counter, iterations, session):
+    clients = make_clients(app, session)
+    results = {}
+    for name, url, admin in cases:
+        client = clients[admin]
+        timed_get(client, counter, url)
+        latencies, queries = [], []
+        started = time.perf_counter()
+        for _ in range(iterations):
+            elapsed, count = timed_get(client, counter, url)
+            latencies.append(elapsed)
+            queries.append(count)
+        results[name] = summarize(latencies, queries, time.perf_counter() - started)
+    return results
+
+def run_load(app, cases, counter, threads, requests_per_thread, session, seed=42):
+    def worker(index):
+        rng = random.Random(seed + index)
+        clients = make_clients(app, session)
+        latencies, queries = [], []
+        for _ in range(requests_per_thread):
+            name, url, admin = rng.choice(cases)
+            elapsed, count = timed_get(clients[admin], counter, url)
+            latencies.append(elapsed)
+            queries.append(count)
+        return latencies, queries
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        outcomes = list(executor.map(worker, range(threads)))
+    wall = time.perf_counter() - started
+    return summarize([value for latencies, _ in outcomes for value in latencies],
+                     [value for _, queries in outcomes for value in queries], wall)
+
+def compare(results, baseline, tolerance, floor_ms=2.0):
+    regressions = []
+    for name, current in results['routes'].items():
+        previous = baseline.get('routes', {}).get(name)
+        if previous is None:
+            continue
+        if current['p50'] > previous['p50'] * (1 + tolerance) and current['p50'] - previous['p50'] > floor_ms:
+            regressions.append(f"{name}: p50 {previous['p50']} ms -> {current['p50']} ms")
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{name}: {previous['queries']} -> {current['queries']} requêtes SQL")
+    previous = baseline.get('load')
+    if previous and results['load']['rps'] < previous['rps'] * (1 - tolerance):
+        regressions.append(f"charge: {previous['rps']} -> {results['load']['rps']} req/s")
+    return regressions
+
+def run(database_url=None, volumes=VOLUMES, iterations=50, threads=8, requests_per_thread=100):
+    workdir = None
+    if database_url is None:
+        workdir = tempfile.mkdtemp(prefix='bellari-bench-')
+        database_url = f"sqlite:///{os.path.join(workdir, 'bench.sqlite')}"
+    try:
+        with bench_app(database_url) as app:
+            with app.app_context():
+                seed_volumes(volumes)
+                cases = route_cases(app)
+                counter = QueryCounter(db.engine)
+            session = admin_session(app)
+            return {
+                'database': database_url.split(':', 1)[0],
+                'volumes': volumes,
+                'routes': run_routes(app, cases, counter, iterations, session),
+                'load': run_load(app, cases, counter, threads, requests_per_thread, session),
+            }
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as handle:
+        return json.load(handle)
+
+def save_baseline(path, results):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
@@ -0,0 +1,89 @@
+import fcntl
+import os
+import zlib
+from contextlib import contextmanager
+from flask import current_app
+from sqlalchemy import inspect, text
+from models import db, Admin, SiteSettings, Service
+from seo import seed_default_pages
+from database import lift_statement_timeout
+from utils import generate_random_image
+
+LOCK_KEY = zlib.crc32(b'bellari-bootstrap')
+
+DEFAULT_SERVICES = [
+    {'title': 'Nettoyage Fin de Chantier', 'description': 'Service spécialisé dans le nettoyage après travaux. Éliminez tous les débris, poussières et résidus de chantier pour une livraison parfaite.', 'icon': 'hard-hat', 'featured': True, 'order': 1},
+    {'title': 'Nettoyage d\'Appartements', 'description': 'Entretien professionnel de vos appartements avec produits de qualité. Service complet pour un logement impeccable.', 'icon': 'home', 'featured': True, 'order': 2},
+    {'title': 'Nettoyage de Bureau', 'description': 'Maintien d\'un environnement de travail propre et professionnel. Service régulier ou occasionnel pour vos bureaux.', 'icon': 'building-2', 'featured': True, 'order': 3},
+    {'title': 'Nettoyage Fin d\'Événement', 'description': 'Nettoyage complet après événements. Remise en état rapide et efficace des lieux après vos festivités.', 'icon': 'sparkles', 'order': 4},
+]
+
+@contextmanager
+def bootstrap_lock():
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.connect() as connection:
+            lift_statement_timeout(connection)
+            connection.execute(text('SELECT pg_advisory_lock(:key)'), {'key': LOCK_KEY})
+            try:
+                yield
+            finally:
+                connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': LOCK_KEY})
+                connection.commit()
+    else:
+        path = current_app.config['BOOTSTRAP_LOCK']
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+def upgrade_schema():
+    inspector = inspect(db.engine)
+    changes = []
+    with db.engine.begin() as connection:
+        lift_statement_timeout(connection)
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                    changes.append(f'{table.name}.{column.name}')
+            indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(connection)
+                    changes.append(index.name)
+    return changes
+
+def seed():
+    if not Admin.query.first():
+        admin = Admin(username='admin')
+        admin.set_password('admin123')
+        db.session.add(admin)
+        db.session.commit()
+
+    if not SiteSettings.query.first():
+        db.session.add(SiteSettings())
+        db.session.commit()
+
+    seed_default_pages()
+
+    if not Service.query.first():
+        for data in DEFAULT_SERVICES:
+            image = generate_random_image(filename=f"service_{data['title'].lower().replace(' ', '_')}.jpg")
+            db.session.add(Service(**data, image=image))
+        db.session.commit()
+
+def run_bootstrap():
+    with bootstrap_lock():
+        changes = upgrade_schema()
+        with db.engine.begin() as connection:
+            lift_statement_timeout(connection)
+            db.metadata.create_all(connection)
+        seed()
+    return changes
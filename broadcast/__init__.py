@@ -0,0 +1,127 @@
+import os
+import select
+import threading
+import time
+from flask import current_app
+from sqlalchemy import event, select as select_rows
+from models import db, CacheVersion
+
+CHANNEL = 'cache_invalidation'
+
+class VersionBroadcast:
+    def __init__(self):
+        self.app = None
+        self.mode = 'off'
+        self.pid = None
+        self.versions = None
+        self.modified = {}
+        self.subscribers = []
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        mode = app.config['CACHE_BROADCAST']
+        if mode == 'auto':
+            uri = app.config['SQLALCHEMY_DATABASE_URI'] or ''
+            listen = uri.startswith(('postgres://', 'postgresql')) and not app.config['DB_PGBOUNCER']
+            mode = 'listen' if listen else 'poll'
+        self.mode = mode
+        if mode != 'off':
+            app.before_request(self.ensure_started)
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def ensure_started(self):
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.versions = None
+        threading.Thread(target=self.run, name='cache-broadcast', daemon=True).start()
+
+    def owns_thread(self):
+        return self.app is current_app._get_current_object()
+
+    def snapshot(self):
+        with self.lock:
+            if self.versions is None or self.pid != os.getpid():
+                return None
+            return dict(self.versions), dict(self.modified)
+
+    def reload(self):
+        with db.engine.connect() as connection:
+            rows = connection.execute(select_rows(CacheVersion.name, CacheVersion.version, CacheVersion.updated_at)).all()
+        versions = {name: version for name, version, _ in rows}
+        with self.lock:
+            if not self.owns_thread():
+                return set()
+            previous = self.versions
+            self.versions = versions
+            self.modified = {name: updated for name, _, updated in rows if updated}
+        if previous is None:
+            return set()
+        changed = {name for name in previous.keys() | versions.keys() if previous.get(name) != versions.get(name)}
+        if changed:
+            for callback in self.subscribers:
+                callback(*changed)
+        return changed
+
+    def run(self):
+        app = self.app
+        delay = 1
+        with app.app_context():
+            while self.app is app:
+                try:
+                    if self.mode == 'listen':
+                        self.listen()
+                    else:
+                        self.poll()
+                except Exception:
+                    app.logger.exception('Diffusion des invalidations interrompue')
+                    with self.lock:
+                        self.versions = None
+                    time.sleep(delay)
+                    delay = min(delay * 2, 30)
+
+    def listen(self):
+        connection = db.engine.raw_connection()
+        connection.detach()
+        driver = connection.driver_connection
+        try:
+            driver.autocommit = True
+            with driver.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            self.reload()
+            while self.owns_thread():
+                if select.select([driver], [], [], 30) == ([], [], []):
+                    self.reload()
+                    continue
+                driver.poll()
+                if driver.notifies:
+                    driver.notifies.clear()
+                    self.reload()
+        finally:
+            connection.close()
+
+    def poll(self):
+        while self.owns_thread():
+            self.reload()
+            time.sleep(self.app.config['CACHE_POLL_INTERVAL'])
+
+version_broadcast = VersionBroadcast()
+
+def notify(connection, names):
+    if connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql('SELECT pg_notify(%s, %s)', (CHANNEL, ','.join(sorted(names))))
+
+@event.listens_for(db.session, 'after_commit')
+def reload_committed_versions(session):
+    if session.info.pop('cache_bumped', None) and version_broadcast.snapshot() is not None:
+        version_broadcast.reload()
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_rolled_back_versions(session):
+    session.info.pop('cache_bumped', None)
@@ -0,0 +1,217 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from flask import g, request, session, current_app, make_response
+from flask_login import current_user
+from werkzeug.http import http_date
+from models import db, CacheVersion, Service, SiteSettings, SEOSettings
+from compression import COMPRESSIBLE, choose_encoding, encoded_body, mark_encoded, etag_matches
+from templating import source_fingerprint
+from stores import MemoryStore, create_store
+from broadcast import version_broadcast, notify
+
+def load_versions():
+    if 'cache_versions' not in g:
+        snapshot = None if g.get('db_replica') else version_broadcast.snapshot()
+        if snapshot is not None:
+            g.cache_versions, g.cache_modified = snapshot
+            return
+        rows = db.session.query(CacheVersion.name, CacheVersion.version, CacheVersion.updated_at).all()
+        g.cache_versions = {name: version for name, version, _ in rows}
+        g.cache_modified = {name: updated for name, _, updated in rows if updated}
+
+def get_versions():
+    load_versions()
+    return g.cache_versions
+
+def get_version(name):
+    return get_versions().get(name, 0)
+
+def get_modified(names):
+    load_versions()
+    times = [g.cache_modified[name] for name in names if name in g.cache_modified]
+    return max(times, default=None)
+
+def bump_version(*names):
+    now = datetime.utcnow()
+    for name in names:
+        updated = CacheVersion.query.filter_by(name=name).update({CacheVersion.version: CacheVersion.version + 1, CacheVersion.updated_at: now})
+        if not updated:
+            db.session.add(CacheVersion(name=name, version=1, updated_at=now))
+    notify(db.session.connection(), names)
+    db.session.info.setdefault('purge_tags', set()).update(names)
+    db.session.info.setdefault('cache_bumped', set()).update(names)
+    db.session.info.setdefault('freeze_tags', set()).update(names)
+    g.pop('cache_versions', None)
+    g.pop('cache_modified', None)
+
+class PageCache:
+    def __init__(self, store=None):
+        self.store = store or MemoryStore()
+
+    def configure(self, store):
+        self.store = store
+
+    def get(self, key):
+        entry = self.store.get(key)
+        if entry is None:
+            return None
+        versions = get_versions()
+        if any(versions.get(tag, 0) != version for tag, version in entry['tags'].items()):
+            self.purge(key)
+            return None
+        return entry
+
+    def set(self, key, body, mimetype, tags, headers=None, versions=None):
+        versions = get_versions() if versions is None else versions
+        entry = {
+            'body': body,
+            'mimetype': mimetype,
+            'headers': headers or {},
+            'tags': {tag: versions.get(tag, 0) for tag in tags},
+        }
+        self.save(key, entry)
+
+    def save(self, key, entry):
+        self.store.set(key, entry, current_app.config['PAGE_CACHE_TTL'])
+
+    def purge(self, *keys):
+        self.store.delete(*keys)
+
+    def purge_tags(self, *tags):
+        self.store.delete_matching(lambda entry: set(tags) & entry['tags'].keys())
+
+    def clear(self):
+        self.store.clear()
+
+page_cache = PageCache()
+version_broadcast.subscribe(page_cache.purge_tags)
+
+def init_cache(app):
+    page_cache.configure(create_store(app.config))
+    version_broadcast.init_app(app)
+
+def invalidate(*tags):
+    bump_version(*tags)
+    page_cache.purge_tags(*tags)
+
+def image_tags(filename):
+    tags = set()
+    settings = SiteSettings.query.first()
+    if settings and filename in (settings.hero_image, settings.about_image, settings.logo_image, settings.favicon):
+        tags.add('settings')
+    for service in Service.query.filter_by(image=filename).all():
+        tags.update(('services', f'service-{service.id}'))
+    for seo in SEOSettings.query.filter_by(meta_image=filename).all():
+        tags.add(f'seo-{seo.page_name}')
+    return tags
+
+def is_cacheable():
+    if request.method != 'GET':
+        return False
+    if '_flashes' in session:
+        return False
+    return not current_user.is_authenticated
+
+def cached_response(entry, key=None):
+    response = current_app.response_class(mimetype=entry['mimetype'], headers=entry['headers'])
+    encoding = None
+    if entry['mimetype'] in COMPRESSIBLE:
+        response.vary.add('Accept-Encoding')
+        if len(entry['body']) >= current_app.config['COMPRESS_MIN_SIZE']:
+            encoding = choose_encoding()
+    if encoding is None:
+        response.set_data(entry['body'])
+    else:
+        known = len(entry.get('encodings', ()))
+        response.set_data(encoded_body(entry, encoding))
+        if key is not None and page_cache.store.shared and len(entry['encodings']) > known:
+            page_cache.save(key, entry)
+        mark_encoded(response, encoding)
+    return response
+
+def cache_stream(key, response, tags, headers=None):
+    app = current_app._get_current_object()
+    versions = dict(get_versions())
+    chunks = response.response
+
+    def generate():
+        body = []
+        for chunk in chunks:
+            body.append(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            yield chunk
+        with app.app_context():
+            page_cache.set(key, b''.join(body), response.mimetype, tags, headers, versions=versions)
+
+    response.response = generate()
+    return response
+
+def etag_salt():
+    app = current_app._get_current_object()
+    if 'etag_salt' not in app.extensions:
+        app.extensions['etag_salt'] = source_fingerprint(app)
+    return app.extensions['etag_salt']
+
+def page_validators(key, tags):
+    versions = get_versions()
+    state = f"{etag_salt()}|{key!r}|" + ','.join(f'{tag}={versions.get(tag, 0)}' for tag in tags)
+    modified = get_modified(tags)
+    started = current_app.config['STARTED_AT']
+    modified = max(modified.replace(tzinfo=timezone.utc), started) if modified else started
+    return hashlib.sha1(state.encode()).hexdigest(), modified.replace(microsecond=0)
+
+def surrogate_headers(response, tags):
+    if tags:
+        response.headers['Surrogate-Key'] = ' '.join(tags)
+        response.headers['Cache-Tag'] = ','.join(tags)
+    response.cache_control.public = True
+    response.cache_control.max_age = 0
+    response.cache_control.must_revalidate = True
+    if current_app.config['PROXY_MAX_AGE']:
+        response.cache_control.s_maxage = current_app.config['PROXY_MAX_AGE']
+    return response
+
+def is_not_modified(etag, modified):
+    if request.if_none_match:
+        return etag_matches(etag) is not None
+    return request.if_modified_since is not None and modified <= request.if_modified_since
+
+def not_modified(etag, modified, tags):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag_matches(etag) or etag)
+    response.last_modified = modified
+    return surrogate_headers(response, tags)
+
+def cached_page(*tags):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            if not is_cacheable():
+                response = make_response(view(**kwargs))
+                response.cache_control.private = True
+                response.cache_control.no_store = True
+                return response
+            key = (request.host, request.endpoint, tuple(sorted(kwargs.items())), request.query_string)
+            page_tags = [tag.format(**kwargs) for tag in tags]
+            etag, modified = page_validators(key, page_tags)
+            headers = {'ETag': f'"{etag}"', 'Last-Modified': http_date(modified)}
+            entry = page_cache.get(key)
+            if entry is not None:
+                if is_not_modified(etag, modified):
+                    return not_modified(etag, modified, page_tags)
+                return surrogate_headers(cached_response(entry, key), page_tags)
+            response = make_response(view(**kwargs))
+            if response.status_code != 200:
+                return response
+            if is_not_modified(etag, modified):
+                page_cache.set(key, response.get_data(), response.mimetype, page_tags, headers)
+                return not_modified(etag, modified, page_tags)
+            response.headers.update(headers)
+            surrogate_headers(response, page_tags)
+            if response.is_streamed:
+                return cache_stream(key, response, page_tags, headers)
+            page_cache.set(key, response.get_data(), response.mimetype, page_tags, headers)
+            return response
+        wrapper.cache_tags = tags
+        return wrapper
+    return decorator
@@ -0,0 +1,164 @@
+import os
+import click
+from flask import current_app
+from utils import generate_variants, referenced_images, image_placeholder, store_image_info
+from jobs import dispatch, get_executor, image_path
+from cache import invalidate
+from models import db, Admin, ImageJob, ImageInfo
+from security import change_credentials
+from storage import collect_garbage
+from freeze import freeze
+import stats
+from bootstrap import run_bootstrap
+import assets
+import bench
+import outbox
+
+def register_commands(app):
+    @app.cli.command('bootstrap')
+    def bootstrap():
+        changes = run_bootstrap()
+        for change in changes:
+            click.echo(f'Schéma mis à jour: {change}')
+        click.echo('Base de données prête')
+
+    @app.cli.command('set-admin-password')
+    @click.argument('username')
+    @click.password_option()
+    def set_admin_password(username, password):
+        admin = Admin.query.filter_by(username=username).first()
+        if admin is None:
+            raise click.ClickException(f'Administrateur inconnu: {username}')
+        change_credentials(admin, password=password)
+        db.session.commit()
+        click.echo('Mot de passe mis à jour')
+
+    @app.cli.command('backfill-images')
+    @click.option('--all', 'include_all', is_flag=True, help='Inclure toutes les images de static/images.')
+    def backfill_images(include_all):
+        folder = os.path.join(current_app.static_folder, 'images')
+        filenames = referenced_images()
+        if include_all:
+            filenames.update(name for name in os.listdir(folder) if os.path.isfile(os.path.join(folder, name)))
+        for filename in sorted(filenames):
+            path = os.path.join(folder, filename)
+            if not os.path.isfile(path):
+                click.echo(f'Introuvable: {filename}')
+                continue
+            created = generate_variants(path)
+            click.echo(f'{filename}: {len(created)} variantes')
+        invalidate('images')
+        db.session.commit()
+
+    @app.cli.command('backfill-placeholders')
+    @click.option('--all', 'include_all', is_flag=True, help='Inclure toutes les images de static/images.')
+    @click.option('--force', is_flag=True, help='Recalculer les images déjà traitées.')
+    def backfill_placeholders(include_all, force):
+        folder = os.path.join(current_app.static_folder, 'images')
+        filenames = referenced_images()
+        if include_all:
+            filenames.update(name for name in os.listdir(folder) if os.path.isfile(os.path.join(folder, name)))
+        if not force:
+            filenames -= {filename for (filename,) in db.session.query(ImageInfo.filename)}
+        filenames = sorted(name for name in filenames if os.path.isfile(image_path(app, name)))
+        executor = get_executor(app)
+        results = executor.map(image_placeholder, [image_path(app, name) for name in filenames], chunksize=8)
+        for filename, info in zip(filenames, results):
+            store_image_info(filename, info)
+            if info:
+                click.echo(f"{filename}: {info['width']}x{info['height']} {info['color'] or '-'}")
+        invalidate('images')
+        db.session.commit()
+        executor.shutdown(wait=True)
+        click.echo(f'{len(filenames)} images analysées')
+
+    @app.cli.command('gc-images')
+    @click.option('--dry-run', is_flag=True, help='Lister les fichiers sans les supprimer.')
+    @click.option('--grace', default=3600, show_default=True, help='Âge minimal (secondes) d\'un fichier supprimable.')
+    def gc_images(dry_run, grace):
+        removed = collect_garbage(dry_run=dry_run, grace=grace)
+        for filename, variants, size in removed:
+            click.echo(f'{filename} (+{variants} variantes, {size / 1024:.0f} Ko)')
+        total = sum(size for _, _, size in removed) / 1024 / 1024
+        verb = 'à supprimer' if dry_run else 'supprimés'
+        click.echo(f'{len(removed)} fichiers {verb}, {total:.1f} Mo')
+
+    @app.cli.command('process-images')
+    def process_images():
+        jobs = ImageJob.query.filter_by(status='pending').all()
+        for job in jobs:
+            dispatch(app, job.id, job.filename)
+        get_executor(app).shutdown(wait=True)
+        click.echo(f'{len(jobs)} images traitées')
+
+    @app.cli.command('dispatch-outbox')
+    @click.option('--once', is_flag=True, help='Vider la file puis s\'arrêter.')
+    @click.option('--retry-failed', is_flag=True, help='Remettre en file les notifications en échec définitif.')
+    def dispatch_outbox(once, retry_failed):
+        if retry_failed:
+            click.echo(f'{outbox.retry_failed()} notifications remises en file')
+            db.session.commit()
+        sent = outbox.Dispatcher(app).run(once=once)
+        click.echo(f'{sent} notifications traitées')
+
+    @app.cli.command('serve', context_settings={'ignore_unknown_options': True})
+    @click.argument('command', nargs=-1, required=True, type=click.UNPROCESSED)
+    def serve(command):
+        raise SystemExit(outbox.supervise(app, command))
+
+    @app.cli.command('reconcile-stats')
+    def reconcile_stats():
+        result = stats.reconcile()
+        db.session.commit()
+        click.echo(f'Messages: {result.messages_count} ({result.unread_count} non lus), '
+                   f'services: {result.services_count}, témoignages: {result.testimonials_count}')
+
+    @app.cli.command('build-assets')
+    @click.option('--no-css', is_flag=True, help='Empreinter les fichiers statiques sans recompiler le CSS.')
+    def build_assets(no_css):
+        manifest, icons = assets.build(app.static_folder, css=not no_css)
+        for logical, filename in sorted(manifest.items()):
+            click.echo(f'{logical} -> {filename}')
+        click.echo(f'{len(icons)} icônes conservées')
+
+    @app.cli.command('freeze')
+    @click.option('--full', is_flag=True, help='Tout régénérer sans réutiliser la version publiée.')
+    def freeze_site(full):
+        rendered, total = freeze(full=full)
+        for path in rendered:
+            click.echo(f'Rendu: {path}')
+        click.echo(f"{len(rendered)}/{total} pages régénérées dans {os.path.join(app.config['FREEZE_DIR'], 'current')}")
+
+    @app.cli.command('bench')
+    @click.option('--database-url', default=None, help='Base PostgreSQL jetable (SQLite temporaire par défaut).')
+    @click.option('--iterations', default=50, show_default=True, help='Requêtes mesurées par route.')
+    @click.option('--threads', default=8, show_default=True, help='Threads du générateur de charge.')
+    @click.option('--requests', 'requests_per_thread', default=100, show_default=True, help='Requêtes par thread.')
+    @click.option('--messages', default=bench.VOLUMES['messages'], show_default=True)
+    @click.option('--baseline', 'baseline_path', default=None, help='Fichier de référence (instance/bench_baseline.json par défaut).')
+    @click.option('--save-baseline', is_flag=True, help='Enregistrer les résultats comme nouvelle référence.')
+    @click.option('--tolerance', default=0.25, show_default=True, help='Dégradation tolérée avant échec.')
+    def run_bench(database_url, iterations, threads, requests_per_thread, messages, baseline_path, save_baseline, tolerance):
+        baseline_path = baseline_path or os.path.join(app.instance_path, 'bench_baseline.json')
+        volumes = {**bench.VOLUMES, 'messages': messages}
+        results = bench.run(database_url, volumes, iterations, threads, requests_per_thread)
+        click.echo(f"{'route':<40} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'sql':>6}")
+        for name, row in sorted(results['routes'].items()):
+            click.echo(f"{name:<40} {row['p50']:>8} {row['p95']:>8} {row['p99']:>8} {row['rps']:>8} {row['queries']:>6}")
+        load = results['load']
+        click.echo(f"Charge ({threads} threads, {load['requests']} requêtes): {load['rps']} req/s, "
+                   f"p50 {load['p50']} ms, p95 {load['p95']} ms, p99 {load['p99']} ms, {load['queries']} requêtes SQL/req")
+        if save_baseline:
+            bench.save_baseline(baseline_path, results)
+            click.echo(f'Référence enregistrée dans {baseline_path}')
+            return
+        baseline = bench.load_baseline(baseline_path)
+        if baseline is None:
+            click.echo('Aucune référence: relancer avec --save-baseline pour en créer une')
+            return
+        regressions = bench.compare(results, baseline, tolerance)
+        for regression in regressions:
+            click.echo(f'Régression: {regression}', err=True)
+        if regressions:
+            raise SystemExit(1)
+        click.echo('Aucune régression par rapport à la référence')
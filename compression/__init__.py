@@ -0,0 +1,93 @@
+import zlib
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = {'text/html', 'text/plain', 'text/xml', 'application/xml'}
+STREAM_FLUSH_SIZE = 8192
+
+def choose_encoding():
+    accepted = request.accept_encodings
+    if brotli and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+def compressor(encoding, level):
+    if encoding == 'br':
+        return brotli.Compressor(quality=level['br'])
+    return zlib.compressobj(level['gzip'], zlib.DEFLATED, 31)
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level['br'])
+    engine = compressor(encoding, level)
+    return engine.compress(data) + engine.flush()
+
+def compress_stream(chunks, encoding, level):
+    engine = compressor(encoding, level)
+    pending = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        output = engine.process(chunk) if encoding == 'br' else engine.compress(chunk)
+        pending += len(chunk)
+        if pending >= STREAM_FLUSH_SIZE:
+            output += engine.flush() if encoding == 'br' else engine.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if output:
+            yield output
+    yield engine.finish() if encoding == 'br' else engine.flush()
+
+def dynamic_level():
+    return {'gzip': current_app.config['COMPRESS_LEVEL'], 'br': current_app.config['COMPRESS_BROTLI_QUALITY']}
+
+def static_level():
+    return {'gzip': 9, 'br': 11}
+
+def mark_encoded(response, encoding):
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)
+
+def etag_matches(etag):
+    if request.if_none_match.star_tag:
+        return etag
+    for candidate in (etag, f'{etag}-gzip', f'{etag}-br'):
+        if request.if_none_match.contains_weak(candidate):
+            return candidate
+    return None
+
+def encoded_body(entry, encoding):
+    encodings = entry.setdefault('encodings', {})
+    if encoding not in encodings:
+        encodings[encoding] = compress(entry['body'], encoding, static_level())
+    return encodings[encoding]
+
+def compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding, dynamic_level())
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+            return response
+        response.set_data(compress(data, encoding, dynamic_level()))
+    mark_encoded(response, encoding)
+    return response
+
+def register_compression(app):
+    app.after_request(compress_response)
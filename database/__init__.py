@@ -0,0 +1,225 @@
+import itertools
+import os
+import threading
+import time
+from bisect import bisect_left
+from flask import current_app, request, session, g, has_request_context
+from sqlalchemy import event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+from models import db
+
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+class PoolMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def record(self, waited, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.wait_buckets[bisect_left(WAIT_BUCKETS, waited)] += 1
+
+    def snapshot(self, pool=None):
+        with self.lock:
+            data = {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_seconds_total': self.wait_total,
+                'wait_seconds_max': self.wait_max,
+                'wait_buckets': dict(zip([*map(str, WAIT_BUCKETS), '+Inf'], self.wait_buckets)),
+            }
+        if isinstance(pool, MeteredQueuePool):
+            capacity = pool.size() + pool.max_overflow
+            data.update(
+                size=pool.size(),
+                max_overflow=pool.max_overflow,
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=pool.overflow(),
+                saturation=round(pool.checkedout() / capacity, 3) if capacity > 0 else None,
+            )
+        return data
+
+pool_metrics = PoolMetrics()
+
+class MeteredQueuePool(QueuePool):
+    def __init__(self, creator, pool_size=5, max_overflow=10, **kwargs):
+        super().__init__(creator, pool_size=pool_size, max_overflow=max_overflow, **kwargs)
+        self.max_overflow = max_overflow
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeout:
+            pool_metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_metrics.record(time.perf_counter() - started)
+        return connection
+
+def is_postgres(uri):
+    return bool(uri) and uri.startswith(('postgres://', 'postgresql'))
+
+def engine_options(config):
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if not uri or uri in ('sqlite://', 'sqlite:///:memory:'):
+        return {}
+    options = {
+        'poolclass': MeteredQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if is_postgres(uri) and not config['DB_PGBOUNCER']:
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_PUBLIC']}"}
+    return options
+
+def statement_timeout(config):
+    if has_request_context() and not request.path.startswith('/admin'):
+        return config['DB_STATEMENT_TIMEOUT_PUBLIC']
+    return config['DB_STATEMENT_TIMEOUT_ADMIN']
+
+PIN_COOKIE = 'db_primary'
+
+REPLICA_LAG = {
+    'postgresql': text(
+        'SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+        'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+    ),
+}
+
+class ReplicaRouter:
+    def __init__(self):
+        self.app = None
+        self.keys = []
+        self.state = {}
+        self.pid = None
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        urls = app.config['DB_REPLICA_URLS']
+        self.keys = [f'replica-{index}' for index in range(len(urls))]
+        if not self.keys:
+            return
+        app.config['SQLALCHEMY_BINDS'] = {**dict(zip(self.keys, urls)), **app.config.get('SQLALCHEMY_BINDS', {})}
+        app.before_request(self.route_request)
+        app.after_request(self.pin_primary)
+
+    def ensure_started(self):
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.state = {}
+        threading.Thread(target=self.run, name='replica-health', daemon=True).start()
+
+    def run(self):
+        with self.app.app_context():
+            while True:
+                self.check()
+                time.sleep(self.app.config['DB_REPLICA_CHECK_INTERVAL'])
+
+    def check(self):
+        for key in self.keys:
+            engine = db.engines[key]
+            try:
+                with engine.connect() as connection:
+                    query = REPLICA_LAG.get(engine.dialect.name, text('SELECT 0'))
+                    lag = float(connection.execute(query).scalar() or 0)
+                state = {'healthy': True, 'lag': lag, 'error': None}
+            except Exception as error:
+                if self.state.get(key, {}).get('healthy'):
+                    self.app.logger.warning('Réplica %s indisponible: %s', key, error)
+                state = {'healthy': False, 'lag': None, 'error': str(error)}
+            state['checked_at'] = time.time()
+            with self.lock:
+                self.state[key] = state
+
+    def available(self):
+        max_lag = self.app.config['DB_REPLICA_MAX_LAG']
+        with self.lock:
+            return [key for key in self.keys
+                    if self.state.get(key, {}).get('healthy') and self.state[key]['lag'] <= max_lag]
+
+    def choose(self):
+        self.ensure_started()
+        available = self.available()
+        if not available:
+            return None
+        return available[next(self.counter) % len(available)]
+
+    def route_request(self):
+        g.db_replica = None
+        if request.method not in ('GET', 'HEAD') or request.path.startswith('/admin'):
+            return
+        if '_user_id' in session or request.cookies.get(PIN_COOKIE):
+            return
+        g.db_replica = self.choose()
+
+    def pin_primary(self, response):
+        if g.get('db_wrote'):
+            response.set_cookie(PIN_COOKIE, '1', max_age=self.app.config['DB_REPLICA_PIN_SECONDS'], httponly=True, samesite='Lax')
+        return response
+
+    def snapshot(self):
+        with self.lock:
+            return {key: dict(self.state.get(key, {'healthy': None})) for key in self.keys}
+
+replica_router = ReplicaRouter()
+
+def init_database(app):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**engine_options(app.config), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    replica_router.init_app(app)
+
+@event.listens_for(db.session, 'do_orm_execute')
+def route_reads(state):
+    if state.is_update or state.is_delete or state.is_insert:
+        state.session.info['wrote'] = True
+    elif state.is_select and has_request_context() and g.get('db_replica'):
+        state.bind_arguments.setdefault('bind', db.engines[g.db_replica])
+
+@event.listens_for(db.session, 'after_flush')
+def mark_written(session, flush_context):
+    session.info['wrote'] = True
+
+@event.listens_for(db.session, 'after_commit')
+def remember_write(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        g.db_wrote = True
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_write(session):
+    session.info.pop('wrote', None)
+
+def lift_statement_timeout(connection):
+    if connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql('SET LOCAL statement_timeout = 0')
+
+@event.listens_for(db.session, 'after_begin')
+def set_statement_timeout(session, transaction, connection):
+    if connection.dialect.name != 'postgresql':
+        return
+    config = current_app.config
+    timeout = statement_timeout(config)
+    if config['DB_PGBOUNCER'] or timeout != config['DB_STATEMENT_TIMEOUT_PUBLIC']:
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout)}')
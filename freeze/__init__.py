@@ -0,0 +1,165 @@
+import fcntl
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from flask import current_app, url_for
+from sqlalchemy import event
+from models import db, Service
+from cache import get_versions
+from compression import compress, static_level, brotli
+from sitemap import SITEMAP_TAGS
+from templating import source_fingerprint
+
+PAGE_ENDPOINTS = ('index', 'services', 'contact', 'devis')
+EXTRA_TAGS = {'sitemap': SITEMAP_TAGS, 'robots': ()}
+COMPRESSED_TYPES = ('.html', '.xml', '.txt')
+
+@contextmanager
+def freeze_lock(root):
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def frozen_pages(app, base_url):
+    pages = [(endpoint, {}) for endpoint in PAGE_ENDPOINTS]
+    pages += [('service_detail', {'id': id}) for (id,) in db.session.query(Service.id).order_by(Service.id)]
+    pages += [(endpoint, {}) for endpoint in EXTRA_TAGS]
+    with app.test_request_context(base_url=base_url):
+        for endpoint, kwargs in pages:
+            tags = EXTRA_TAGS.get(endpoint)
+            if tags is None:
+                tags = getattr(app.view_functions[endpoint], 'cache_tags', ())
+            yield url_for(endpoint, **kwargs), [tag.format(**kwargs) for tag in tags]
+
+def output_name(path):
+    if path == '/':
+        return 'index.html'
+    if path.endswith(('.xml', '.txt')):
+        return path.lstrip('/')
+    return path.strip('/') + '/index.html'
+
+def write_page(release, name, body):
+    target = os.path.join(release, name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, 'wb') as output:
+        output.write(body)
+    if name.endswith(COMPRESSED_TYPES):
+        for encoding, suffix in (('gzip', '.gz'), ('br', '.br')):
+            if encoding == 'br' and brotli is None:
+                continue
+            with open(target + suffix, 'wb') as output:
+                output.write(compress(body, encoding, static_level()))
+
+def reuse_page(previous, release, name):
+    for suffix in ('', '.gz', '.br'):
+        source = os.path.join(previous, name + suffix)
+        if not os.path.exists(source):
+            continue
+        target = os.path.join(release, name + suffix)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+
+def read_manifest(release):
+    try:
+        with open(os.path.join(release, 'manifest.json')) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return None
+
+def publish(root, release):
+    current = os.path.join(root, 'current')
+    link = os.path.join(root, '.current.tmp')
+    if os.path.lexists(link):
+        os.unlink(link)
+    os.symlink(os.path.relpath(release, root), link)
+    os.replace(link, current)
+
+def prune(root, keep):
+    releases = os.path.join(root, 'releases')
+    current = os.path.realpath(os.path.join(root, 'current'))
+    names = sorted(os.listdir(releases))
+    for name in names[:-keep]:
+        path = os.path.join(releases, name)
+        if os.path.realpath(path) != current:
+            shutil.rmtree(path, ignore_errors=True)
+
+def freeze(full=False):
+    app = current_app._get_current_object()
+    root = app.config['FREEZE_DIR']
+    base_url = app.config['FREEZE_BASE_URL']
+    with freeze_lock(root):
+        previous = os.path.realpath(os.path.join(root, 'current'))
+        manifest = None if full else read_manifest(previous)
+        fingerprint = source_fingerprint(app)
+        if manifest and (manifest['base_url'] != base_url or manifest['fingerprint'] != fingerprint):
+            manifest = None
+        versions = dict(get_versions())
+        release = os.path.join(root, 'releases', datetime.now().strftime('%Y%m%d%H%M%S%f') + f'-{os.getpid()}')
+        os.makedirs(release)
+        client = app.test_client()
+        pages, rendered = {}, []
+        for path, tags in frozen_pages(app, base_url):
+            name = output_name(path)
+            state = {tag: versions.get(tag, 0) for tag in tags}
+            known = manifest['pages'].get(path) if manifest else None
+            if known and known['tags'] == state and os.path.exists(os.path.join(previous, name)):
+                reuse_page(previous, release, name)
+            else:
+                response = client.get(path, base_url=base_url, headers={'Accept-Encoding': 'identity'})
+                if response.status_code != 200:
+                    raise RuntimeError(f'{path}: HTTP {response.status_code}')
+                write_page(release, name, response.get_data())
+                rendered.append(path)
+            pages[path] = {'file': name, 'tags': state}
+        if manifest and not rendered and pages.keys() == manifest['pages'].keys():
+            shutil.rmtree(release)
+            return rendered, len(pages)
+        with open(os.path.join(release, 'manifest.json'), 'w') as output:
+            json.dump({'base_url': base_url, 'fingerprint': fingerprint, 'pages': pages}, output, indent=2, sort_keys=True)
+        publish(root, release)
+        prune(root, app.config['FREEZE_KEEP'])
+    return rendered, len(pages)
+
+class Refreezer:
+    def __init__(self):
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def schedule(self, app):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+            self.timer = threading.Timer(app.config['FREEZE_DELAY'], self.run, (app,))
+            self.timer.start()
+
+    def run(self, app):
+        with self.lock:
+            self.timer = None
+        with app.app_context():
+            try:
+                rendered, total = freeze()
+            except Exception:
+                app.logger.exception('Export statique interrompu')
+                return
+        app.logger.info('Export statique: %d/%d pages régénérées', len(rendered), total)
+
+refreezer = Refreezer()
+
+@event.listens_for(db.session, 'after_commit')
+def refreeze_committed_changes(session):
+    if session.info.pop('freeze_tags', None) and current_app.config['FREEZE_AUTO']:
+        refreezer.schedule(current_app._get_current_object())
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_rolled_back_changes(session):
+    session.info.pop('freeze_tags', None)
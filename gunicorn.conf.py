@@ -0,0 +1,20 @@
+import time
+
+preload_app = True
+
+def when_ready(server):
+    from templating import warm_templates
+    warm_templates(server.app.wsgi())
+
+def pre_fork(server, worker):
+    worker.boot_started = time.perf_counter()
+
+def post_fork(server, worker):
+    from models import db
+    app = server.app.wsgi()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+def post_worker_init(worker):
+    worker.log.info('Worker %s prêt en %.0f ms', worker.pid, (time.perf_counter() - worker.boot_started) * 1000)
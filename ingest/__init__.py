@@ -0,0 +1,195 @@
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+from email_validator import validate_email, EmailNotValidError
+from models import db, ContactMessage
+from outbox import notify_messages
+import stats
+
+FIELD_LIMITS = {'name': 100, 'email': 120, 'phone': 20, 'subject': 200, 'message': 5000}
+REQUIRED_FIELDS = ('name', 'email', 'message')
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self):
+        self.refill()
+        return self.tokens >= 1
+
+    def consume(self):
+        self.refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+def validate_message(form):
+    data = {field: (form.get(field) or '').strip() for field in FIELD_LIMITS}
+    for field in REQUIRED_FIELDS:
+        if not data[field]:
+            return None, 'Veuillez remplir tous les champs obligatoires.'
+    for field, limit in FIELD_LIMITS.items():
+        if len(data[field]) > limit:
+            return None, 'Votre message est trop long.'
+    try:
+        data['email'] = validate_email(data['email'], check_deliverability=False).normalized
+    except EmailNotValidError:
+        return None, 'Adresse email invalide.'
+    return data, None
+
+QUOTE_LIMITS = {'name': 100, 'phone': 30, 'email': 120, 'service': 200, 'address': 255, 'surface': 50, 'date': 10, 'details': 5000}
+QUOTE_REQUIRED = ('name', 'phone', 'service', 'address')
+
+def validate_quote(form):
+    data = {field: (form.get(field) or '').strip() for field in QUOTE_LIMITS}
+    for field in QUOTE_REQUIRED:
+        if not data[field]:
+            return None, 'Veuillez remplir tous les champs obligatoires.'
+    for field, limit in QUOTE_LIMITS.items():
+        if len(data[field]) > limit:
+            return None, 'Votre demande est trop longue.'
+    if data['email']:
+        try:
+            data['email'] = validate_email(data['email'], check_deliverability=False).normalized
+        except EmailNotValidError:
+            return None, 'Adresse email invalide.'
+    desired_date = data.pop('date')
+    try:
+        data['desired_date'] = date.fromisoformat(desired_date) if desired_date else None
+    except ValueError:
+        return None, 'Date souhaitée invalide.'
+    return {field: value or None for field, value in data.items()}, None
+
+class ContactIngest:
+    def __init__(self, app=None):
+        self.buffer = []
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.counters = {'accepted': 0, 'throttled': 0, 'rejected': 0, 'flushed': 0, 'spooled': 0}
+        self.thread = None
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if self.app is None:
+            atexit.register(self.shutdown)
+        self.app = app
+        app.extensions['contact_ingest'] = self
+
+    def allow(self, client):
+        config = self.app.config
+        with self.lock:
+            bucket = self.buckets.pop(client, None) or TokenBucket(config['CONTACT_RATE'], config['CONTACT_BURST'])
+            self.buckets[client] = bucket
+            if len(self.buckets) > 10000:
+                self.buckets.pop(next(iter(self.buckets)))
+            return bucket.consume()
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def submit(self, form, client):
+        if not self.allow(client):
+            self.count('throttled')
+            return 'throttled', 'Trop de messages envoyés, veuillez réessayer plus tard.'
+        data, error = validate_message(form)
+        if error:
+            self.count('rejected')
+            return 'rejected', error
+        data['created_at'] = datetime.utcnow()
+        data['is_read'] = False
+        with self.lock:
+            self.buffer.append(data)
+            self.counters['accepted'] += 1
+            full = len(self.buffer) >= self.app.config['CONTACT_BATCH_SIZE']
+        self.start()
+        if full:
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception('Contact ingest flush failed')
+        return 'accepted', None
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.run, name='contact-ingest', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            time.sleep(self.app.config['CONTACT_FLUSH_INTERVAL'])
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception('Contact ingest flush failed')
+
+    def take(self):
+        with self.lock:
+            rows, self.buffer = self.buffer, []
+        return rows
+
+    def flush(self):
+        with self.flush_lock:
+            rows = self.take() + self.read_spool()
+            if not rows:
+                return 0
+            try:
+                with self.app.app_context():
+                    ids = db.session.scalars(db.insert(ContactMessage).returning(ContactMessage.id, sort_by_parameter_order=True), rows).all()
+                    notify_messages([dict(row, id=id) for row, id in zip(rows, ids)])
+                    stats.adjust(messages_count=len(rows), unread_count=len(rows))
+                    db.session.commit()
+            except Exception:
+                self.spool(rows)
+                raise
+            self.count('flushed', len(rows))
+            return len(rows)
+
+    def spool(self, rows):
+        path = self.app.config['CONTACT_SPOOL']
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as spool:
+            for row in rows:
+                spool.write(json.dumps(dict(row, created_at=row['created_at'].isoformat())) + '\n')
+        self.count('spooled', len(rows))
+
+    def read_spool(self):
+        path = self.app.config['CONTACT_SPOOL']
+        claimed = f'{path}.{os.getpid()}'
+        try:
+            os.replace(path, claimed)
+        except FileNotFoundError:
+            return []
+        with open(claimed, encoding='utf-8') as spool:
+            rows = [json.loads(line) for line in spool if line.strip()]
+        os.remove(claimed)
+        for row in rows:
+            row['created_at'] = datetime.fromisoformat(row['created_at'])
+        return rows
+
+    def shutdown(self):
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counters, buffered=len(self.buffer))
+
+contact_ingest = ContactIngest()
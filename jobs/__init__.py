@@ -0,0 +1,80 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from flask import current_app
+from sqlalchemy import event
+from models import db, ImageJob
+from utils import process_image, store_image_info
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=app.config['IMAGE_WORKERS'])
+        return _executor
+
+def image_path(app, filename):
+    return os.path.join(app.static_folder, 'images', filename)
+
+def enqueue_image(filename):
+    job = ImageJob(filename=filename)
+    db.session.add(job)
+    db.session.flush()
+    db.session.info.setdefault('image_jobs', []).append((job.id, filename))
+    return job
+
+def dispatch(app, job_id, filename):
+    future = get_executor(app).submit(process_image, image_path(app, filename))
+    future.add_done_callback(partial(finish_job, app, job_id))
+    return future
+
+def finish_job(app, job_id, future):
+    from cache import invalidate, image_tags
+    with app.app_context():
+        job = db.session.get(ImageJob, job_id)
+        if job is None:
+            return
+        error = future.exception()
+        if error:
+            job.status = 'failed'
+            job.error = str(error)
+        else:
+            result = future.result()
+            job.status = 'done'
+            job.variants = len(result['variants'])
+            store_image_info(job.filename, result['info'])
+            invalidate('images', *image_tags(job.filename))
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+def resume_stale_jobs():
+    app = current_app._get_current_object()
+    limit = datetime.utcnow() - timedelta(seconds=app.config['IMAGE_JOB_STALE'])
+    jobs = ImageJob.query.filter(ImageJob.status == 'pending', ImageJob.dispatched_at < limit).all()
+    for job in jobs:
+        job.dispatched_at = datetime.utcnow()
+    db.session.commit()
+    return [dispatch(app, job.id, job.filename) for job in jobs]
+
+def job_statuses(filenames=None):
+    query = ImageJob.query.order_by(ImageJob.id)
+    if filenames is not None:
+        query = query.filter(ImageJob.filename.in_(filenames))
+    return {job.filename: job.status for job in query}
+
+@event.listens_for(db.session, 'after_commit')
+def dispatch_committed_jobs(session):
+    jobs = session.info.pop('image_jobs', [])
+    if jobs:
+        app = current_app._get_current_object()
+        for job_id, filename in jobs:
+            dispatch(app, job_id, filename)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_rolled_back_jobs(session):
+    session.info.pop('image_jobs', None)
@@ -0,0 +1,149 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from flask import g, request, current_app, has_app_context, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+slow_query_log = logging.getLogger('slow_queries')
+
+class Histogram:
+    def __init__(self, name, description, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label, value):
+        with self.lock:
+            series = self.series.setdefault(label, {'buckets': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0})
+            series['buckets'][bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self, label_name='endpoint'):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = {label: {**data, 'buckets': list(data['buckets'])} for label, data in self.series.items()}
+        for label, data in sorted(series.items()):
+            labels = f'{label_name}="{escape_label(label)}"'
+            cumulative = 0
+            for bound, count in zip([*map(str, self.buckets), '+Inf'], data['buckets']):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {data["sum"]}')
+            lines.append(f'{self.name}_count{{{labels}}} {data["count"]}')
+        return lines
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+request_duration = Histogram('bellari_request_duration_seconds', 'Temps total de traitement par endpoint.')
+sql_duration = Histogram('bellari_sql_duration_seconds', 'Temps SQL cumulé par requête.')
+sql_statements = Histogram('bellari_sql_statements', 'Nombre de requêtes SQL par requête HTTP.', COUNT_BUCKETS)
+render_duration = Histogram('bellari_render_duration_seconds', 'Temps de rendu des templates par requête.')
+HISTOGRAMS = (request_duration, sql_duration, sql_statements, render_duration)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def finish_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['statement_started'].pop()
+    if not has_app_context():
+        return
+    timings = g.get('timings')
+    if timings is not None:
+        timings['sql_count'] += 1
+        timings['sql_time'] += elapsed
+    if elapsed * 1000 >= current_app.config['SLOW_QUERY_MS']:
+        endpoint = request.endpoint if has_request_context() else '-'
+        slow_query_log.warning('%.1f ms [%s] %s', elapsed * 1000, endpoint, ' '.join(statement.split()))
+
+def start_render(sender, template, context, **extra):
+    timings = g.get('timings')
+    if timings is not None:
+        timings['render_started'].append(time.perf_counter())
+
+def finish_render(sender, template, context, **extra):
+    timings = g.get('timings')
+    if timings is not None and timings['render_started']:
+        timings['render_time'] += time.perf_counter() - timings['render_started'].pop()
+
+def start_request():
+    g.timings = {'started': time.perf_counter(), 'sql_count': 0, 'sql_time': 0.0, 'render_time': 0.0, 'render_started': []}
+
+def server_timing(response):
+    timings = g.get('timings')
+    if timings is None or not current_app.config['SERVER_TIMING']:
+        return response
+    elapsed = time.perf_counter() - timings['started']
+    parts = [
+        f'db;dur={timings["sql_time"] * 1000:.1f};desc="{timings["sql_count"]} SQL"',
+        f'app;dur={elapsed * 1000:.1f}',
+    ]
+    if timings['render_time']:
+        parts.insert(1, f'render;dur={timings["render_time"] * 1000:.1f}')
+    response.headers['Server-Timing'] = ', '.join(parts)
+    return response
+
+def record_request(exc=None):
+    timings = g.pop('timings', None)
+    if timings is None:
+        return
+    endpoint = request.endpoint or 'none'
+    request_duration.observe(endpoint, time.perf_counter() - timings['started'])
+    sql_duration.observe(endpoint, timings['sql_time'])
+    sql_statements.observe(endpoint, timings['sql_count'])
+    render_duration.observe(endpoint, timings['render_time'])
+
+def pool_lines(snapshot):
+    lines = [
+        '# HELP bellari_db_pool_wait_seconds Attente lors de la récupération d\'une connexion.',
+        '# TYPE bellari_db_pool_wait_seconds histogram',
+    ]
+    cumulative = 0
+    for bound, count in snapshot['wait_buckets'].items():
+        cumulative += count
+        lines.append(f'bellari_db_pool_wait_seconds_bucket{{le="{bound}"}} {cumulative}')
+    lines.append(f'bellari_db_pool_wait_seconds_sum {snapshot["wait_seconds_total"]}')
+    lines.append(f'bellari_db_pool_wait_seconds_count {snapshot["checkouts"] + snapshot["timeouts"]}')
+    lines += ['# TYPE bellari_db_pool_timeouts_total counter', f'bellari_db_pool_timeouts_total {snapshot["timeouts"]}']
+    for name in ('size', 'checked_out', 'overflow', 'saturation'):
+        if snapshot.get(name) is not None:
+            lines += [f'# TYPE bellari_db_pool_{name} gauge', f'bellari_db_pool_{name} {snapshot[name]}']
+    return lines
+
+def render_metrics(pool_snapshot=None):
+    lines = [line for histogram in HISTOGRAMS for line in histogram.render()]
+    if pool_snapshot is not None:
+        lines += pool_lines(pool_snapshot)
+    return '\n'.join(lines) + '\n'
+
+class SlowQueryHandler(logging.FileHandler):
+    def __init__(self, path):
+        super().__init__(path, delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+def init_metrics(app):
+    path = app.config['SLOW_QUERY_LOG']
+    if path and not slow_query_log.handlers:
+        handler = SlowQueryHandler(path)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(process)d %(message)s'))
+        slow_query_log.addHandler(handler)
+    slow_query_log.setLevel(logging.WARNING)
+    app.before_request(start_request)
+    app.after_request(server_timing)
+    app.teardown_request(record_request)
+    before_render_template.connect(start_render, app)
+    template_rendered.connect(finish_render, app)
@@ -28,8 +28,14 @@ class Service(db.Model):
     seo_title = db.Column(db.String(200))
     seo_description = db.Column(db.String(500))
     seo_keywords = db.Column(db.String(500))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class ContactMessage(db.Model):
+    __table_args__ = (
+        db.Index('ix_contact_message_created_at_id', 'created_at', 'id'),
+        db.Index('ix_contact_message_is_read_created_at', 'is_read', 'created_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), nullable=False)
@@ -39,6 +45,35 @@ class ContactMessage(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_read = db.Column(db.Boolean, default=False)
 
+class QuoteRequest(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    phone = db.Column(db.String(30), nullable=False)
+    email = db.Column(db.String(120))
+    service = db.Column(db.String(200), nullable=False)
+    address = db.Column(db.String(255), nullable=False)
+    surface = db.Column(db.String(50))
+    desired_date = db.Column(db.Date)
+    details = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class OutboxMessage(db.Model):
+    __table_args__ = (
+        db.Index('ix_outbox_message_status_available_at', 'status', 'available_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(20), nullable=False)
+    idempotency_key = db.Column(db.String(120), unique=True, nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
 class Testimonial(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -85,6 +120,7 @@ class SEOSettings(db.Model):
     twitter_card = db.Column(db.String(50), default='summary_large_image')
     structured_data = db.Column(db.Text, default='')
     custom_head_code = db.Column(db.Text, default='')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class SiteImage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -93,3 +129,34 @@ class SiteImage(db.Model):
     category = db.Column(db.String(50), default='general')
     alt_text = db.Column(db.String(200))
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ImageJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), nullable=False, index=True)
+    status = db.Column(db.String(20), default='pending', nullable=False, index=True)
+    variants = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    dispatched_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+class ImageInfo(db.Model):
+    filename = db.Column(db.String(255), primary_key=True)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    color = db.Column(db.String(7))
+    placeholder = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DashboardStats(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    messages_count = db.Column(db.Integer, default=0, nullable=False)
+    unread_count = db.Column(db.Integer, default=0, nullable=False)
+    services_count = db.Column(db.Integer, default=0, nullable=False)
+    testimonials_count = db.Column(db.Integer, default=0, nullable=False)
+    reconciled_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CacheVersion(db.Model):
+    name = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,295 @@
+import json
+import os
+import random
+import signal
+import smtplib
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from flask import current_app
+from sqlalchemy import and_, or_, func
+from models import db, OutboxMessage, SiteSettings
+
+CHANNELS = ('whatsapp', 'email')
+
+class PermanentError(Exception):
+    pass
+
+def enqueue(channel, key, payload):
+    db.session.add(OutboxMessage(channel=channel, idempotency_key=key, payload=json.dumps(payload, ensure_ascii=False)))
+
+def recipients():
+    config = current_app.config
+    settings = SiteSettings.query.first()
+    whatsapp = config['NOTIFY_WHATSAPP_TO'] or (settings.whatsapp if settings else '')
+    email = config['NOTIFY_EMAIL_TO'] or (settings.email if settings else '')
+    return whatsapp, email
+
+def quote_text(quote):
+    lines = [
+        '*DEMANDE DE DEVIS*',
+        f'*Nom:* {quote.name}',
+        f'*Téléphone:* {quote.phone}',
+        f'*Service:* {quote.service}',
+        f'*Adresse:* {quote.address}',
+    ]
+    if quote.email:
+        lines.append(f'*Email:* {quote.email}')
+    if quote.surface:
+        lines.append(f'*Surface:* {quote.surface}')
+    if quote.desired_date:
+        lines.append(f'*Date souhaitée:* {quote.desired_date.strftime("%d/%m/%Y")}')
+    if quote.details:
+        lines.append(f'*Détails:* {quote.details}')
+    return '\n'.join(lines)
+
+def notify_quote(quote):
+    db.session.flush()
+    whatsapp, email = recipients()
+    text = quote_text(quote)
+    if whatsapp:
+        enqueue('whatsapp', f'quote-{quote.id}-whatsapp', {'to': whatsapp, 'text': text})
+    if email:
+        enqueue('email', f'quote-{quote.id}-email', {
+            'to': email,
+            'subject': f'Demande de devis - {quote.name}',
+            'body': text.replace('*', ''),
+            'reply_to': quote.email,
+        })
+
+def notify_messages(messages):
+    _, email = recipients()
+    if not email:
+        return
+    for message in messages:
+        body = f"Nom: {message['name']}\nEmail: {message['email']}\n"
+        if message.get('phone'):
+            body += f"Téléphone: {message['phone']}\n"
+        body += f"\n{message['message']}"
+        enqueue('email', f"contact-{message['id']}-email", {
+            'to': email,
+            'subject': message.get('subject') or f"Nouveau message de {message['name']}",
+            'body': body,
+            'reply_to': message['email'],
+        })
+
+class FakeTransport:
+    def __init__(self, path=None):
+        self.path = path
+        self.sent = []
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def send(self, key, payload):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError('Échec simulé')
+            self.sent.append((key, payload))
+            if self.path:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as log:
+                    log.write(json.dumps({'key': key, 'payload': payload, 'sent_at': time.time()}, ensure_ascii=False) + '\n')
+
+class WhatsAppTransport:
+    def __init__(self, config):
+        self.url = f"{config['WHATSAPP_API_URL'].rstrip('/')}/{config['WHATSAPP_PHONE_ID']}/messages"
+        self.token = config['WHATSAPP_TOKEN']
+
+    def send(self, key, payload):
+        body = {
+            'messaging_product': 'whatsapp',
+            'to': ''.join(char for char in payload['to'] if char.isdigit()),
+            'type': 'text',
+            'text': {'body': payload['text']},
+        }
+        request = urllib.request.Request(self.url, data=json.dumps(body).encode(), method='POST', headers={
+            'Authorization': f'Bearer {self.token}',
+            'Content-Type': 'application/json',
+            'Idempotency-Key': key,
+        })
+        try:
+            urllib.request.urlopen(request, timeout=10).close()
+        except urllib.error.HTTPError as error:
+            if 400 <= error.code < 500 and error.code not in (408, 429):
+                raise PermanentError(f'WhatsApp {error.code}: {error.read()[:500].decode(errors="replace")}')
+            raise
+
+class EmailTransport:
+    def __init__(self, config):
+        self.host = config['SMTP_HOST']
+        self.port = config['SMTP_PORT']
+        self.username = config['SMTP_USER']
+        self.password = config['SMTP_PASSWORD']
+        self.sender = config['SMTP_FROM']
+        self.starttls = config['SMTP_STARTTLS']
+
+    def send(self, key, payload):
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = payload['to']
+        message['Subject'] = payload['subject']
+        message['Message-ID'] = f"<{key}@{self.sender.rpartition('@')[2] or 'localhost'}>"
+        if payload.get('reply_to'):
+            message['Reply-To'] = payload['reply_to']
+        message.set_content(payload['body'])
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+                if self.starttls:
+                    smtp.starttls()
+                if self.username:
+                    smtp.login(self.username, self.password)
+                smtp.send_message(message)
+        except smtplib.SMTPRecipientsRefused as error:
+            raise PermanentError(f'Destinataire refusé: {error.recipients}')
+
+def create_transports(config):
+    if config['OUTBOX_TRANSPORT'] == 'fake':
+        fake = FakeTransport(config['OUTBOX_FAKE_LOG'])
+        return {'whatsapp': fake, 'email': fake}
+    transports = {}
+    if config['WHATSAPP_TOKEN'] and config['WHATSAPP_PHONE_ID']:
+        transports['whatsapp'] = WhatsAppTransport(config)
+    if config['SMTP_HOST']:
+        transports['email'] = EmailTransport(config)
+    return transports
+
+def backoff(config, attempts):
+    delay = min(config['OUTBOX_BACKOFF_BASE'] * 2 ** (attempts - 1), config['OUTBOX_BACKOFF_MAX'])
+    return delay * random.uniform(0.5, 1)
+
+class Dispatcher:
+    def __init__(self, app, transports=None):
+        self.app = app
+        self.transports = transports if transports is not None else create_transports(app.config)
+        self.stopping = False
+        for channel in CHANNELS:
+            if channel not in self.transports:
+                app.logger.error('Transport %s non configuré: ses notifications restent en attente', channel)
+
+    def due(self):
+        now = datetime.utcnow()
+        due = or_(
+            and_(OutboxMessage.status == 'pending', OutboxMessage.available_at <= now),
+            and_(OutboxMessage.status == 'sending', OutboxMessage.locked_until < now),
+        )
+        return (db.session.query(OutboxMessage.id, OutboxMessage.status, OutboxMessage.attempts)
+                .filter(due, OutboxMessage.channel.in_(self.transports.keys()))
+                .order_by(OutboxMessage.id).limit(self.app.config['OUTBOX_BATCH_SIZE']).all())
+
+    def claim(self, id, status, attempts):
+        lease = datetime.utcnow() + timedelta(seconds=self.app.config['OUTBOX_LEASE'])
+        updated = OutboxMessage.query.filter_by(id=id, status=status, attempts=attempts).update({
+            OutboxMessage.status: 'sending',
+            OutboxMessage.attempts: attempts + 1,
+            OutboxMessage.locked_until: lease,
+        }, synchronize_session=False)
+        db.session.commit()
+        if not updated:
+            return None
+        row = db.session.get(OutboxMessage, id)
+        return row.id, row.channel, row.idempotency_key, json.loads(row.payload), row.attempts
+
+    def finish(self, id, attempts, **values):
+        OutboxMessage.query.filter_by(id=id, status='sending', attempts=attempts).update(values, synchronize_session=False)
+        db.session.commit()
+
+    def deliver(self, id, channel, key, payload, attempts):
+        config = self.app.config
+        try:
+            self.transports[channel].send(key, payload)
+        except Exception as error:
+            permanent = isinstance(error, PermanentError) or attempts >= config['OUTBOX_MAX_ATTEMPTS']
+            self.app.logger.warning('Notification %s en échec (tentative %d): %s', key, attempts, error)
+            if permanent:
+                self.finish(id, attempts, status='failed', locked_until=None, last_error=str(error))
+            else:
+                retry_at = datetime.utcnow() + timedelta(seconds=backoff(config, attempts))
+                self.finish(id, attempts, status='pending', available_at=retry_at, locked_until=None, last_error=str(error))
+            return False
+        self.finish(id, attempts, status='sent', sent_at=datetime.utcnow(), locked_until=None, last_error=None)
+        return True
+
+    def dispatch_batch(self):
+        with self.app.app_context():
+            count = 0
+            for row in self.due():
+                if self.stopping:
+                    break
+                claimed = self.claim(*row)
+                if claimed is not None:
+                    self.deliver(*claimed)
+                    count += 1
+            return count
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run(self, once=False):
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+        total = 0
+        while not self.stopping:
+            try:
+                count = self.dispatch_batch()
+            except Exception:
+                self.app.logger.exception('Distribution des notifications interrompue')
+                count = 0
+            total += count
+            if once and count < self.app.config['OUTBOX_BATCH_SIZE']:
+                break
+            if not count:
+                time.sleep(self.app.config['OUTBOX_POLL_INTERVAL'])
+        return total
+
+def supervise(app, command, restart_max=60):
+    server = subprocess.Popen(command)
+    dispatcher = None
+    delay = 1
+    started = time.monotonic()
+
+    def forward(signum, frame):
+        server.send_signal(signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    while server.poll() is None:
+        if dispatcher is not None and dispatcher.poll() is not None:
+            app.logger.error('Distributeur de notifications arrêté (code %s), relance dans %d s', dispatcher.returncode, delay)
+            time.sleep(delay)
+            delay = min(delay * 2, restart_max)
+            dispatcher = None
+        if dispatcher is None and server.poll() is None:
+            started = time.monotonic()
+            dispatcher = subprocess.Popen([sys.executable, '-m', 'flask', '--app', 'app', 'dispatch-outbox'])
+        if time.monotonic() - started > restart_max:
+            delay = 1
+        time.sleep(1)
+    if dispatcher is not None and dispatcher.poll() is None:
+        dispatcher.terminate()
+        try:
+            dispatcher.wait(app.config['OUTBOX_LEASE'])
+        except subprocess.TimeoutExpired:
+            dispatcher.kill()
+    return server.returncode
+
+def retry_failed():
+    return OutboxMessage.query.filter_by(status='failed').update({
+        OutboxMessage.status: 'pending',
+        OutboxMessage.attempts: 0,
+        OutboxMessage.available_at: datetime.utcnow(),
+    }, synchronize_session=False)
+
+def snapshot():
+    counts = dict(db.session.query(OutboxMessage.status, func.count()).group_by(OutboxMessage.status).all())
+    oldest = db.session.query(func.min(OutboxMessage.created_at)).filter(OutboxMessage.status.in_(('pending', 'sending'))).scalar()
+    return {
+        'counts': counts,
+        'oldest_pending_seconds': (datetime.utcnow() - oldest).total_seconds() if oldest else 0,
+    }
@@ -0,0 +1,61 @@
+import json
+import threading
+import urllib.request
+from flask import current_app
+from sqlalchemy import event
+from models import db
+
+class HTTPPurger:
+    def __init__(self, app, url, token=None, timeout=5):
+        self.app = app
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+
+    def purge(self, tags):
+        threading.Thread(target=self.send, args=(sorted(tags),), daemon=True).start()
+
+    def send(self, tags):
+        headers = {'Content-Type': 'application/json', 'Surrogate-Key': ' '.join(tags), 'Cache-Tag': ','.join(tags)}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        body = json.dumps({'tags': tags}).encode()
+        request = urllib.request.Request(self.url, data=body, headers=headers, method=self.app.config['PURGE_METHOD'])
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except OSError:
+            self.app.logger.exception('Purge du proxy échouée pour %s', ', '.join(tags))
+
+class StubPurger:
+    def __init__(self):
+        self.purged = []
+        self.lock = threading.Lock()
+
+    def purge(self, tags):
+        with self.lock:
+            self.purged.append(sorted(tags))
+
+    def take(self):
+        with self.lock:
+            purged, self.purged = self.purged, []
+        return purged
+
+def init_purge(app):
+    url = app.config['PURGE_URL']
+    if url == 'stub':
+        app.extensions['purger'] = StubPurger()
+    elif url:
+        app.extensions['purger'] = HTTPPurger(app, url, app.config['PURGE_TOKEN'])
+
+@event.listens_for(db.session, 'after_commit')
+def purge_committed_tags(session):
+    tags = session.info.pop('purge_tags', None)
+    if tags:
+        purger = current_app.extensions.get('purger')
+        if purger is not None:
+            purger.purge(tags)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_rolled_back_tags(session):
+    session.info.pop('purge_tags', None)
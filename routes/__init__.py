@@ -1,12 +1,26 @@
 import os
-import uuid
+import mimetypes
 from datetime import datetime
-from flask import render_template, request, redirect, url_for, flash, current_app, Response, make_response
-from flask_login import login_user, logout_user, login_required, current_user
+from flask import render_template, stream_template, session, request, redirect, url_for, flash, current_app, Response, make_response, jsonify, stream_with_context, send_from_directory, abort
+from werkzeug.http import http_date
+from werkzeug.security import safe_join
+from security import login_user, logout_user, login_required, current_user, login_throttle, principal_cache
 from werkzeug.utils import secure_filename
 from models import db, Admin, Service, ContactMessage, Testimonial, SiteSettings, SEOSettings, SiteImage
 from services import ServiceManager
-from utils import get_settings
+from stats import get_stats, adjust as adjust_stats
+from ingest import contact_ingest, validate_quote
+from outbox import snapshot as outbox_snapshot
+from jobs import enqueue_image, resume_stale_jobs, job_statuses
+from utils import get_settings, asset_manifest, is_fingerprinted
+from cache import invalidate, cached_page, cached_response, image_tags, page_cache, surrogate_headers
+from compression import etag_matches
+from seo import seo_registry
+from templating import render_profiler
+from database import pool_metrics, replica_router
+from metrics import render_metrics
+from storage import store_upload, release_file
+from sitemap import SITEMAP_TAGS, sitemap_etag, build_pages, last_modified, render as render_sitemap
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'svg'}
 
@@ -16,52 +30,112 @@ def allowed_file(filename):
 def save_uploaded_file(file, folder='images'):
     if file and allowed_file(file.filename):
         ext = file.filename.rsplit('.', 1)[1].lower()
-        filename = f"{uuid.uuid4().hex}.{ext}"
         upload_path = os.path.join(current_app.static_folder, folder)
-        os.makedirs(upload_path, exist_ok=True)
-        file.save(os.path.join(upload_path, filename))
+        filename, created = store_upload(file, upload_path, ext)
+        if created:
+            enqueue_image(filename)
         return filename
     return None
 
+def render_page(template, **context):
+    if '_flashes' in session:
+        return render_template(template, **context)
+    return stream_template(template, **context)
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+def send_static(filename):
+    folder = current_app.static_folder
+    fingerprinted = is_fingerprinted(filename)
+    served, encoding = filename, None
+    if fingerprinted:
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            path = safe_join(folder, filename + suffix)
+            if request.accept_encodings[candidate] and path and os.path.isfile(path):
+                served, encoding = filename + suffix, candidate
+                break
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    max_age = 31536000 if fingerprinted else current_app.get_send_file_max_age(filename)
+    if current_app.config['STATIC_SENDFILE'] == 'x-accel-redirect':
+        path = safe_join(folder, served)
+        if not path or not os.path.isfile(path):
+            abort(404)
+        response = current_app.response_class(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = current_app.config['STATIC_ACCEL_PREFIX'] + served
+    else:
+        response = send_from_directory(folder, served, mimetype=mimetype, max_age=max_age)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if fingerprinted:
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.cache_control.immutable = True
+    return response
+
 def register_routes(app):
+    @app.url_defaults
+    def fingerprint_static_url(endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = asset_manifest().get(values['filename'], values['filename'])
+
+    app.view_functions['static'] = send_static
+
     @app.route('/')
+    @cached_page('settings', 'services', 'testimonials', 'images', 'seo-accueil')
     def index():
         featured = ServiceManager.get_featured_services()
         all_services = ServiceManager.get_all_services()
         testimonials = ServiceManager.get_approved_testimonials()
-        seo = SEOSettings.query.filter_by(page_name='accueil').first()
-        return render_template('public/index.html', featured_services=featured, all_services=all_services, testimonials=testimonials, seo=seo)
+        seo = seo_registry.get('accueil')
+        return render_page('public/index.html', featured_services=featured, all_services=all_services, testimonials=testimonials, seo=seo)
 
     @app.route('/services')
+    @cached_page('settings', 'services', 'images', 'seo-services')
     def services():
         services = ServiceManager.get_all_services()
-        seo = SEOSettings.query.filter_by(page_name='services').first()
-        return render_template('public/services.html', services=services, seo=seo)
+        seo = seo_registry.get('services')
+        return render_page('public/services.html', services=services, seo=seo)
 
     @app.route('/service/<int:id>')
+    @cached_page('settings', 'images', 'service-{id}')
     def service_detail(id):
         service = Service.query.get_or_404(id)
-        return render_template('public/service_detail.html', service=service)
+        return render_page('public/service_detail.html', service=service, seo=seo_registry.get_service(id))
 
     @app.route('/contact', methods=['GET', 'POST'])
+    @cached_page('settings', 'images', 'seo-contact')
     def contact():
         if request.method == 'POST':
-            ServiceManager.save_message(
-                name=request.form.get('name'),
-                email=request.form.get('email'),
-                phone=request.form.get('phone'),
-                subject=request.form.get('subject'),
-                message=request.form.get('message')
-            )
-            flash('Votre message a été envoyé avec succès!', 'success')
+            status, error = contact_ingest.submit(request.form, client=request.remote_addr)
+            if status == 'accepted':
+                flash('Votre message a été envoyé avec succès!', 'success')
+            else:
+                flash(error, 'error')
             return redirect(url_for('contact'))
-        seo = SEOSettings.query.filter_by(page_name='contact').first()
-        return render_template('public/contact.html', seo=seo)
+        seo = seo_registry.get('contact')
+        return render_page('public/contact.html', seo=seo)
 
-    @app.route('/devis')
+    @app.route('/devis', methods=['GET', 'POST'])
+    @cached_page('settings', 'seo-devis')
     def devis():
-        seo = SEOSettings.query.filter_by(page_name='devis').first()
-        return render_template('public/devis.html', seo=seo)
+        if request.method == 'POST':
+            if not contact_ingest.allow(request.remote_addr):
+                flash('Trop de demandes envoyées, veuillez réessayer plus tard.', 'error')
+                return redirect(url_for('devis'))
+            data, error = validate_quote(request.form)
+            if error:
+                flash(error, 'error')
+                return redirect(url_for('devis'))
+            ServiceManager.save_quote(data)
+            flash('Votre demande de devis a été envoyée, nous vous recontactons rapidement!', 'success')
+            return redirect(url_for('devis'))
+        seo = seo_registry.get('devis')
+        return render_page('public/devis.html', seo=seo)
 
     @app.route('/admin/login', methods=['GET', 'POST'])
     def admin_login():
@@ -69,10 +143,14 @@ def register_routes(app):
             return redirect(url_for('admin_dashboard'))
         
         if request.method == 'POST':
+            if not login_throttle.allow(request.remote_addr, request.form.get('username')):
+                flash('Trop de tentatives de connexion, réessayez dans quelques minutes', 'error')
+                return render_template('admin/login.html'), 429
             user = Admin.query.filter_by(username=request.form.get('username')).first()
             if user and user.check_password(request.form.get('password')):
                 login_user(user)
                 return redirect(url_for('admin_dashboard'))
+            login_throttle.failed(request.remote_addr, request.form.get('username'))
             flash('Identifiants incorrects', 'error')
         
         return render_template('admin/login.html')
@@ -80,45 +158,63 @@ def register_routes(app):
     @app.route('/admin/logout')
     @login_required
     def admin_logout():
+        principal_cache.discard(current_user.id)
         logout_user()
         return redirect(url_for('index'))
 
     @app.route('/admin/')
     @login_required
     def admin_dashboard():
-        unread = ContactMessage.query.filter_by(is_read=False).count()
-        services = Service.query.count()
-        messages = ContactMessage.query.count()
-        testimonials = Testimonial.query.count()
-        recent = ContactMessage.query.order_by(ContactMessage.created_at.desc()).limit(5).all()
+        stats = get_stats()
+        recent = ContactMessage.query.order_by(ContactMessage.created_at.desc(), ContactMessage.id.desc()).limit(5).all()
         
         return render_template('admin/dashboard.html',
-            unread_count=unread, services_count=services,
-            messages_count=messages, testimonials_count=testimonials,
+            unread_count=stats.unread_count, services_count=stats.services_count,
+            messages_count=stats.messages_count, testimonials_count=stats.testimonials_count,
             recent_messages=recent)
 
     @app.route('/admin/messages')
     @login_required
     def admin_messages():
-        messages = ContactMessage.query.order_by(ContactMessage.created_at.desc()).all()
-        return render_template('admin/messages.html', messages=messages)
+        page = ServiceManager.get_messages_page(
+            status=request.args.get('status'),
+            date_from=parse_date(request.args.get('date_from')),
+            date_to=parse_date(request.args.get('date_to')),
+            before=request.args.get('before'),
+            after=request.args.get('after'),
+            limit=current_app.config['MESSAGES_PER_PAGE']
+        )
+        filters = {key: request.args[key] for key in ('status', 'date_from', 'date_to') if request.args.get(key)}
+        return render_template('admin/messages.html', filters=filters, **page)
+
+    @app.route('/admin/messages/ingest')
+    @login_required
+    def admin_messages_ingest():
+        return jsonify(contact_ingest.snapshot())
+
+    @app.route('/admin/outbox')
+    @login_required
+    def admin_outbox():
+        return jsonify(outbox_snapshot())
 
     @app.route('/admin/messages/<int:id>/read', methods=['POST'])
     @login_required
     def admin_mark_read(id):
-        msg = ContactMessage.query.get_or_404(id)
-        msg.is_read = True
+        ContactMessage.query.get_or_404(id)
+        if ContactMessage.query.filter_by(id=id, is_read=False).update({ContactMessage.is_read: True}):
+            adjust_stats(unread_count=-1)
         db.session.commit()
-        return redirect(url_for('admin_messages'))
+        return redirect(url_for('admin_messages', **request.args))
 
     @app.route('/admin/messages/<int:id>/delete', methods=['POST'])
     @login_required
     def admin_delete_message(id):
         msg = ContactMessage.query.get_or_404(id)
         db.session.delete(msg)
+        adjust_stats(messages_count=-1, unread_count=0 if msg.is_read else -1)
         db.session.commit()
         flash('Message supprimé', 'success')
-        return redirect(url_for('admin_messages'))
+        return redirect(url_for('admin_messages', **request.args))
 
     @app.route('/admin/services')
     @login_required
@@ -150,6 +246,8 @@ def register_routes(app):
                 seo_keywords=request.form.get('seo_keywords')
             )
             db.session.add(service)
+            adjust_stats(services_count=1)
+            invalidate('services')
             db.session.commit()
             flash('Service ajouté avec succès', 'success')
             return redirect(url_for('admin_services'))
@@ -176,6 +274,7 @@ def register_routes(app):
                 if uploaded:
                     service.image = uploaded
             
+            invalidate('services', f'service-{service.id}')
             db.session.commit()
             flash('Service modifié avec succès', 'success')
             return redirect(url_for('admin_services'))
@@ -186,6 +285,8 @@ def register_routes(app):
     def admin_delete_service(id):
         service = Service.query.get_or_404(id)
         db.session.delete(service)
+        adjust_stats(services_count=-1)
+        invalidate('services', f'service-{id}')
         db.session.commit()
         flash('Service supprimé', 'success')
         return redirect(url_for('admin_services'))
@@ -207,6 +308,8 @@ def register_routes(app):
                 approved=request.form.get('approved') == 'on'
             )
             db.session.add(testimonial)
+            adjust_stats(testimonials_count=1)
+            invalidate('testimonials')
             db.session.commit()
             flash('Témoignage ajouté avec succès', 'success')
             return redirect(url_for('admin_testimonials'))
@@ -221,6 +324,7 @@ def register_routes(app):
             testimonial.content = request.form.get('content')
             testimonial.rating = int(request.form.get('rating', 5))
             testimonial.approved = request.form.get('approved') == 'on'
+            invalidate('testimonials')
             db.session.commit()
             flash('Témoignage modifié avec succès', 'success')
             return redirect(url_for('admin_testimonials'))
@@ -231,6 +335,8 @@ def register_routes(app):
     def admin_delete_testimonial(id):
         testimonial = Testimonial.query.get_or_404(id)
         db.session.delete(testimonial)
+        adjust_stats(testimonials_count=-1)
+        invalidate('testimonials')
         db.session.commit()
         flash('Témoignage supprimé', 'success')
         return redirect(url_for('admin_testimonials'))
@@ -282,6 +388,7 @@ def register_routes(app):
                 if uploaded:
                     settings.favicon = uploaded
             
+            invalidate('settings')
             db.session.commit()
             flash('Paramètres mis à jour avec succès', 'success')
             return redirect(url_for('admin_settings'))
@@ -291,13 +398,6 @@ def register_routes(app):
     @app.route('/admin/seo')
     @login_required
     def admin_seo():
-        seos = SEOSettings.query.all()
-        pages = ['accueil', 'services', 'contact', 'devis']
-        for page in pages:
-            if not SEOSettings.query.filter_by(page_name=page).first():
-                seo = SEOSettings(page_name=page, title=f'{page.capitalize()} - Bellari')
-                db.session.add(seo)
-        db.session.commit()
         seos = SEOSettings.query.all()
         return render_template('admin/seo.html', seo_settings=seos)
 
@@ -326,6 +426,7 @@ def register_routes(app):
                 if uploaded:
                     seo.meta_image = uploaded
             
+            invalidate('seo', f'seo-{page}')
             db.session.commit()
             flash('SEO mis à jour', 'success')
             return redirect(url_for('admin_seo'))
@@ -335,8 +436,16 @@ def register_routes(app):
     @app.route('/admin/images')
     @login_required
     def admin_images():
+        resume_stale_jobs()
         images = SiteImage.query.order_by(SiteImage.uploaded_at.desc()).all()
-        return render_template('admin/images.html', images=images)
+        statuses = job_statuses([image.filename for image in images])
+        return render_template('admin/images.html', images=images, statuses=statuses)
+
+    @app.route('/admin/images/status')
+    @login_required
+    def admin_images_status():
+        filenames = request.args.getlist('filename')
+        return jsonify(job_statuses(filenames))
 
     @app.route('/admin/images/upload', methods=['POST'])
     @login_required
@@ -360,7 +469,7 @@ def register_routes(app):
             )
             db.session.add(image)
             db.session.commit()
-            flash('Image uploadée avec succès', 'success')
+            flash('Image uploadée, optimisation en cours', 'success')
         else:
             flash('Erreur lors de l\'upload', 'error')
         
@@ -370,66 +479,64 @@ def register_routes(app):
     @login_required
     def admin_delete_image(id):
         image = SiteImage.query.get_or_404(id)
-        try:
-            filepath = os.path.join(current_app.static_folder, 'images', image.filename)
-            if os.path.exists(filepath):
-                os.remove(filepath)
-        except:
-            pass
+        filename = image.filename
         db.session.delete(image)
+        db.session.flush()
+        tags = image_tags(filename)
+        if tags:
+            invalidate(*tags)
         db.session.commit()
+        release_file(filename)
         flash('Image supprimée', 'success')
         return redirect(url_for('admin_images'))
 
+    @app.route('/admin/templates/profile', methods=['GET', 'POST'])
+    @login_required
+    def admin_template_profile():
+        if request.method == 'POST':
+            render_profiler.reset()
+        return jsonify(enabled=current_app.config['TEMPLATE_PROFILE'], templates=render_profiler.report())
+
+    @app.route('/admin/pool')
+    @login_required
+    def admin_pool():
+        return jsonify({**pool_metrics.snapshot(db.engine.pool), 'replicas': replica_router.snapshot()})
+
+    @app.route('/admin/metrics')
+    @login_required
+    def admin_metrics():
+        body = render_metrics(pool_metrics.snapshot(db.engine.pool))
+        return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
     @app.route('/sitemap.xml')
     def sitemap():
-        pages = []
-        base_url = request.url_root.rstrip('/')
-        now = datetime.now().strftime('%Y-%m-%d')
-        
-        static_pages = [
-            {'loc': '/', 'priority': '1.0', 'changefreq': 'weekly'},
-            {'loc': '/services', 'priority': '0.9', 'changefreq': 'weekly'},
-            {'loc': '/contact', 'priority': '0.8', 'changefreq': 'monthly'},
-            {'loc': '/devis', 'priority': '0.8', 'changefreq': 'monthly'},
-        ]
+        etag = sitemap_etag(request.host)
+        if etag_matches(etag):
+            return surrogate_headers(Response(status=304, headers={'ETag': f'"{etag_matches(etag)}"'}), SITEMAP_TAGS)
         
-        for page in static_pages:
-            seo = SEOSettings.query.filter_by(page_name=page['loc'].strip('/') or 'accueil').first()
-            if seo and 'noindex' in (seo.robots or ''):
-                continue
-            pages.append({
-                'loc': base_url + page['loc'],
-                'lastmod': now,
-                'priority': page['priority'],
-                'changefreq': page['changefreq']
-            })
+        key = (request.host, 'sitemap')
+        entry = page_cache.get(key)
+        if entry is not None:
+            return surrogate_headers(cached_response(entry, key), SITEMAP_TAGS).make_conditional(request)
         
-        services = Service.query.all()
-        for service in services:
-            pages.append({
-                'loc': f"{base_url}/service/{service.id}",
-                'lastmod': now,
-                'priority': '0.7',
-                'changefreq': 'monthly'
-            })
+        pages = build_pages(request.url_root.rstrip('/'))
+        headers = {'ETag': f'"{etag}"'}
+        modified = last_modified(pages)
+        if modified:
+            headers['Last-Modified'] = http_date(modified)
         
-        xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
-        xml += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
-        for page in pages:
-            xml += '  <url>\n'
-            xml += f'    <loc>{page["loc"]}</loc>\n'
-            xml += f'    <lastmod>{page["lastmod"]}</lastmod>\n'
-            xml += f'    <changefreq>{page["changefreq"]}</changefreq>\n'
-            xml += f'    <priority>{page["priority"]}</priority>\n'
-            xml += '  </url>\n'
-        xml += '</urlset>'
+        def generate():
+            chunks = []
+            for chunk in render_sitemap(pages):
+                chunks.append(chunk)
+                yield chunk
+            page_cache.set(key, ''.join(chunks).encode(), 'application/xml', SITEMAP_TAGS, headers)
         
-        response = make_response(xml)
-        response.headers['Content-Type'] = 'application/xml'
-        return response
+        response = Response(stream_with_context(generate()), mimetype='application/xml', headers=headers)
+        return surrogate_headers(response, SITEMAP_TAGS).make_conditional(request)
 
     @app.route('/robots.txt')
+    @cached_page()
     def robots():
         base_url = request.url_root.rstrip('/')
         
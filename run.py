@@ -1,4 +1,7 @@
 from app import app
+from bootstrap import run_bootstrap
 
 if __name__ == '__main__':
+    with app.app_context():
+        run_bootstrap()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -1,3 +1,83 @@
-from flask_login import login_user, logout_user, current_user, login_required
+import threading
+import time
+from flask import current_app
+from flask_login import UserMixin, login_user, logout_user, current_user, login_required
+from models import db, Admin
+from cache import get_version, invalidate
+from ingest import TokenBucket
 
-__all__ = ['login_user', 'logout_user', 'current_user', 'login_required']
+__all__ = ['login_user', 'logout_user', 'current_user', 'login_required',
+           'Principal', 'principal_cache', 'change_credentials', 'login_throttle']
+
+class Principal(UserMixin):
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+def principal_tag(user_id):
+    return f'admin-{user_id}'
+
+class PrincipalCache:
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        version = get_version(principal_tag(user_id))
+        with self.lock:
+            entry = self.entries.get(user_id)
+        if entry is not None and entry[1] == version and entry[2] > time.monotonic():
+            return entry[0]
+        row = db.session.query(Admin.id, Admin.username).filter_by(id=user_id).first()
+        if row is None:
+            self.discard(user_id)
+            return None
+        principal = Principal(row.id, row.username)
+        with self.lock:
+            self.entries[user_id] = (principal, version, time.monotonic() + current_app.config['PRINCIPAL_TTL'])
+        return principal
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+principal_cache = PrincipalCache()
+
+def change_credentials(admin, username=None, password=None):
+    if username:
+        admin.username = username
+    if password:
+        admin.set_password(password)
+    invalidate(principal_tag(admin.id))
+    principal_cache.discard(admin.id)
+
+class LoginThrottle:
+    def __init__(self, max_buckets=10000):
+        self.max_buckets = max_buckets
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, key, rate, burst):
+        bucket = self.buckets.pop(key, None) or TokenBucket(rate, burst)
+        self.buckets[key] = bucket
+        if len(self.buckets) > self.max_buckets:
+            self.buckets.pop(next(iter(self.buckets)))
+        return bucket
+
+    def user_bucket(self, client, username):
+        config = current_app.config
+        key = ('user', (username or '').strip().lower(), client)
+        return self.bucket(key, config['LOGIN_USER_RATE'], config['LOGIN_USER_BURST'])
+
+    def allow(self, client, username):
+        config = current_app.config
+        with self.lock:
+            if not self.bucket(('ip', client), config['LOGIN_IP_RATE'], config['LOGIN_IP_BURST']).consume():
+                return False
+            return self.user_bucket(client, username).available()
+
+    def failed(self, client, username):
+        with self.lock:
+            self.user_bucket(client, username).consume()
+
+login_throttle = LoginThrottle()
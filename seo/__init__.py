@@ -0,0 +1,67 @@
+import threading
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, SEOSettings, Service
+from cache import get_version, bump_version
+from utils import Snapshot
+
+DEFAULT_PAGES = ['accueil', 'services', 'contact', 'devis']
+
+class SEORegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pages = (None, {})
+        self.services = (None, {})
+
+    def get(self, page_name):
+        version = get_version('seo')
+        cached_version, pages = self.pages
+        if cached_version != version:
+            pages = {seo.page_name: Snapshot.of(seo) for seo in SEOSettings.query.all()}
+            with self.lock:
+                self.pages = (version, pages)
+        return pages.get(page_name)
+
+    def get_service(self, id):
+        version = get_version('services')
+        cached_version, services = self.services
+        if cached_version != version:
+            rows = Service.query.with_entities(Service.id, Service.title, Service.description,
+                                               Service.seo_title, Service.seo_description, Service.seo_keywords).all()
+            services = {row.id: service_seo(row) for row in rows}
+            with self.lock:
+                self.services = (version, services)
+        return services.get(id)
+
+def service_seo(service):
+    return Snapshot(
+        page_name=f'service-{service.id}',
+        title=service.seo_title or f'{service.title} - Bellari',
+        description=service.seo_description or (service.description or '')[:160],
+        keywords=service.seo_keywords,
+        meta_image=None,
+        canonical_url=None,
+        robots='index, follow',
+        og_type='website',
+        twitter_card='summary_large_image',
+        structured_data='',
+        custom_head_code='',
+    )
+
+def seed_default_pages():
+    dialect = {'postgresql': postgresql, 'sqlite': sqlite}.get(db.engine.dialect.name)
+    rows = [{'page_name': page, 'title': f'{page.capitalize()} - Bellari'} for page in DEFAULT_PAGES]
+    if dialect is None:
+        existing = {name for (name,) in SEOSettings.query.with_entities(SEOSettings.page_name)}
+        rows = [row for row in rows if row['page_name'] not in existing]
+        inserted = len(rows)
+        if rows:
+            db.session.execute(db.insert(SEOSettings), rows)
+    else:
+        statement = dialect.insert(SEOSettings).values(rows).on_conflict_do_nothing(index_elements=['page_name'])
+        inserted = db.session.execute(statement).rowcount
+    if inserted:
+        bump_version('seo', *[f'seo-{page}' for page in DEFAULT_PAGES])
+    db.session.commit()
+    return inserted
+
+seo_registry = SEORegistry()
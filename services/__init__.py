@@ -1,4 +1,20 @@
-from models import Service, ContactMessage, Testimonial, db
+from datetime import datetime, timedelta
+from sqlalchemy import tuple_
+from models import Service, ContactMessage, QuoteRequest, Testimonial, db
+from outbox import notify_messages, notify_quote
+import stats
+
+CURSOR_FORMAT = '%Y%m%d%H%M%S%f'
+
+def encode_cursor(message):
+    return f"{message.created_at.strftime(CURSOR_FORMAT)}-{message.id}"
+
+def decode_cursor(cursor):
+    try:
+        created_at, id = cursor.split('-')
+        return datetime.strptime(created_at, CURSOR_FORMAT), int(id)
+    except (AttributeError, ValueError):
+        return None
 
 class ServiceManager:
     @staticmethod
@@ -21,5 +37,48 @@ class ServiceManager:
     def save_message(name, email, phone, subject, message):
         msg = ContactMessage(name=name, email=email, phone=phone, subject=subject, message=message)
         db.session.add(msg)
+        db.session.flush()
+        stats.adjust(messages_count=1, unread_count=1)
+        notify_messages([{'id': msg.id, 'name': name, 'email': email, 'phone': phone, 'subject': subject, 'message': message}])
         db.session.commit()
         return msg
+
+    @staticmethod
+    def save_quote(data):
+        quote = QuoteRequest(**data)
+        db.session.add(quote)
+        notify_quote(quote)
+        db.session.commit()
+        return quote
+
+    @staticmethod
+    def get_messages_page(status=None, date_from=None, date_to=None, before=None, after=None, limit=50):
+        query = ContactMessage.query
+        if status == 'unread':
+            query = query.filter(ContactMessage.is_read.is_(False))
+        elif status == 'read':
+            query = query.filter(ContactMessage.is_read.is_(True))
+        if date_from:
+            query = query.filter(ContactMessage.created_at >= date_from)
+        if date_to:
+            query = query.filter(ContactMessage.created_at < date_to + timedelta(days=1))
+
+        key = tuple_(ContactMessage.created_at, ContactMessage.id)
+        before, after = decode_cursor(before), decode_cursor(after)
+        if after and not before:
+            rows = query.filter(key > after).order_by(ContactMessage.created_at.asc(), ContactMessage.id.asc()).limit(limit + 1).all()
+            has_newer = len(rows) > limit
+            messages = list(reversed(rows[:limit]))
+            has_older = True
+        else:
+            if before:
+                query = query.filter(key < before)
+            rows = query.order_by(ContactMessage.created_at.desc(), ContactMessage.id.desc()).limit(limit + 1).all()
+            has_older = len(rows) > limit
+            messages = rows[:limit]
+            has_newer = before is not None
+        return {
+            'messages': messages,
+            'next_cursor': encode_cursor(messages[-1]) if messages and has_older else None,
+            'prev_cursor': encode_cursor(messages[0]) if messages and has_newer else None,
+        }
@@ -0,0 +1,65 @@
+import hashlib
+from xml.sax.saxutils import escape
+from models import Service, SEOSettings
+from cache import get_versions
+
+STATIC_PAGES = [
+    {'loc': '/', 'page_name': 'accueil', 'priority': '1.0', 'changefreq': 'weekly', 'lists_services': True},
+    {'loc': '/services', 'page_name': 'services', 'priority': '0.9', 'changefreq': 'weekly', 'lists_services': True},
+    {'loc': '/contact', 'page_name': 'contact', 'priority': '0.8', 'changefreq': 'monthly', 'lists_services': False},
+    {'loc': '/devis', 'page_name': 'devis', 'priority': '0.8', 'changefreq': 'monthly', 'lists_services': False},
+]
+
+SITEMAP_TAGS = ['services'] + [f"seo-{page['page_name']}" for page in STATIC_PAGES]
+
+def sitemap_etag(host):
+    versions = get_versions()
+    state = host + ':' + ','.join(f'{tag}={versions.get(tag, 0)}' for tag in SITEMAP_TAGS)
+    return hashlib.sha1(state.encode()).hexdigest()
+
+def build_pages(base_url):
+    seos = SEOSettings.query.filter(SEOSettings.page_name.in_([page['page_name'] for page in STATIC_PAGES])).all()
+    seo_by_page = {seo.page_name: seo for seo in seos}
+    services = Service.query.with_entities(Service.id, Service.updated_at).order_by(Service.order, Service.id).all()
+    services_updated = max((updated for _, updated in services if updated), default=None)
+
+    pages = []
+    for page in STATIC_PAGES:
+        seo = seo_by_page.get(page['page_name'])
+        if seo and 'noindex' in (seo.robots or ''):
+            continue
+        dates = [seo.updated_at if seo else None]
+        if page['lists_services']:
+            dates.append(services_updated)
+        pages.append({
+            'loc': base_url + page['loc'],
+            'lastmod': max((date for date in dates if date), default=None),
+            'priority': page['priority'],
+            'changefreq': page['changefreq'],
+        })
+    for id, updated_at in services:
+        pages.append({
+            'loc': f'{base_url}/service/{id}',
+            'lastmod': updated_at,
+            'priority': '0.7',
+            'changefreq': 'monthly',
+        })
+    return pages
+
+def last_modified(pages):
+    return max((page['lastmod'] for page in pages if page['lastmod']), default=None)
+
+def render(pages):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    for page in pages:
+        lastmod = f"    <lastmod>{page['lastmod'].strftime('%Y-%m-%d')}</lastmod>\n" if page['lastmod'] else ''
+        yield (
+            '  <url>\n'
+            f"    <loc>{escape(page['loc'])}</loc>\n"
+            f'{lastmod}'
+            f"    <changefreq>{page['changefreq']}</changefreq>\n"
+            f"    <priority>{page['priority']}</priority>\n"
+            '  </url>\n'
+        )
+    yield '</urlset>'
@@ -0,0 +1,29 @@
+from datetime import datetime
+from models import db, DashboardStats, ContactMessage, Service, Testimonial
+
+STATS_ID = 1
+
+def reconcile():
+    stats = db.session.get(DashboardStats, STATS_ID) or DashboardStats(id=STATS_ID)
+    stats.messages_count = ContactMessage.query.count()
+    stats.unread_count = ContactMessage.query.filter_by(is_read=False).count()
+    stats.services_count = Service.query.count()
+    stats.testimonials_count = Testimonial.query.count()
+    stats.reconciled_at = datetime.utcnow()
+    db.session.add(stats)
+    return stats
+
+def get_stats():
+    stats = db.session.get(DashboardStats, STATS_ID)
+    if stats is None:
+        stats = reconcile()
+        db.session.commit()
+    return stats
+
+def adjust(**deltas):
+    values = {getattr(DashboardStats, name): getattr(DashboardStats, name) + delta for name, delta in deltas.items() if delta}
+    if not values:
+        return
+    db.session.flush()
+    if not DashboardStats.query.filter_by(id=STATS_ID).update(values, synchronize_session=False):
+        reconcile()
@@ -0,0 +1,117 @@
+import glob
+import hashlib
+import os
+import tempfile
+import time
+from flask import current_app
+from models import db, ImageJob, ImageInfo
+from utils import referenced_images, asset_manifest
+
+CHUNK_SIZE = 64 * 1024
+HASH_LENGTH = 32
+
+def content_name(digest, ext):
+    return f'{digest[:HASH_LENGTH]}.{ext}'
+
+def is_content_addressed(filename):
+    stem = filename.rsplit('.', 1)[0]
+    return len(stem) == HASH_LENGTH and all(char in '0123456789abcdef' for char in stem)
+
+def store_upload(file, folder, ext):
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=folder, prefix='.upload-', delete=False) as handle:
+        try:
+            for chunk in iter(lambda: file.stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                handle.write(chunk)
+        except BaseException:
+            os.unlink(handle.name)
+            raise
+    filename = content_name(digest.hexdigest(), ext)
+    path = os.path.join(folder, filename)
+    if os.path.exists(path):
+        os.unlink(handle.name)
+        os.utime(path)
+        return filename, False
+    os.replace(handle.name, path)
+    return filename, True
+
+def image_files(folder):
+    return {name for name in os.listdir(folder) if os.path.isfile(os.path.join(folder, name)) and not name.startswith('.')}
+
+def variant_files(folder, filename):
+    stem = filename.rsplit('.', 1)[0]
+    return [path for path in glob.glob(os.path.join(folder, 'variants', glob.escape(stem) + '-*'))
+            if path.rsplit('-', 1)[0] == os.path.join(folder, 'variants', stem)]
+
+def fingerprinted_copies(folder):
+    prefix = os.path.relpath(folder, current_app.static_folder).replace(os.sep, '/') + '/'
+    copies = {}
+    for logical, hashed in asset_manifest().items():
+        name = logical[len(prefix):]
+        if logical.startswith(prefix) and '/' not in name:
+            target = hashed[len(prefix):]
+            copies[name] = [target, f'{target}.gz', f'{target}.br']
+    return copies
+
+def copy_files(folder, filename):
+    return [path for path in (os.path.join(folder, name) for name in fingerprinted_copies(folder).get(filename, ()))
+            if os.path.isfile(path)]
+
+def remove_file(folder, filename):
+    paths = [os.path.join(folder, filename), *variant_files(folder, filename), *copy_files(folder, filename)]
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    return paths
+
+def release_file(filename):
+    if filename in referenced_images():
+        return False
+    remove_file(os.path.join(current_app.static_folder, 'images'), filename)
+    ImageJob.query.filter_by(filename=filename).delete()
+    ImageInfo.query.filter_by(filename=filename).delete()
+    db.session.commit()
+    return True
+
+def collect_garbage(dry_run=True, grace=3600):
+    folder = os.path.join(current_app.static_folder, 'images')
+    files = image_files(folder)
+    copies = {name for source, names in fingerprinted_copies(folder).items() if source in files for name in names}
+    candidates = files - copies
+    referenced = referenced_images()
+    cutoff = time.time() - grace
+    removed = []
+    for filename in sorted(candidates - referenced):
+        path = os.path.join(folder, filename)
+        if os.path.getmtime(path) > cutoff:
+            continue
+        paths = [path, *variant_files(folder, filename), *copy_files(folder, filename)]
+        size = sum(os.path.getsize(item) for item in paths)
+        if not dry_run:
+            remove_file(folder, filename)
+            ImageJob.query.filter_by(filename=filename).delete()
+            ImageInfo.query.filter_by(filename=filename).delete()
+        removed.append((filename, len(paths) - 1, size))
+    stems = {name.rsplit('.', 1)[0] for name in candidates}
+    variants = os.path.join(folder, 'variants')
+    for name in sorted(os.listdir(variants)) if os.path.isdir(variants) else []:
+        path = os.path.join(variants, name)
+        if os.path.isfile(path) and name.rsplit('-', 1)[0] not in stems and os.path.getmtime(path) < cutoff:
+            size = os.path.getsize(path)
+            if not dry_run:
+                os.unlink(path)
+            removed.append((f'variants/{name}', 0, size))
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name.startswith('.upload-') and os.path.getmtime(path) < cutoff:
+            size = os.path.getsize(path)
+            if not dry_run:
+                os.unlink(path)
+            removed.append((name, 0, size))
+    if not dry_run:
+        db.session.commit()
+    return removed
@@ -0,0 +1,236 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from itertools import count
+from functools import wraps
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+def encode_bytes(value):
+    if isinstance(value, bytes):
+        return {'$bytes': base64.b64encode(value).decode('ascii')}
+    raise TypeError(f'{type(value).__name__} non sérialisable dans le cache')
+
+def decode_bytes(value):
+    if value.keys() == {'$bytes'}:
+        return base64.b64decode(value['$bytes'])
+    return value
+
+def dumps(key, value, expires=None):
+    record = {'key': repr(key), 'value': value, 'expires': expires}
+    return json.dumps(record, default=encode_bytes, separators=(',', ':')).encode()
+
+def loads(data):
+    try:
+        record = json.loads(data, object_hook=decode_bytes)
+        return record['key'], record['value'], record['expires']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+class MemoryStore:
+    shared = False
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.time() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def delete_matching(self, predicate):
+        with self.lock:
+            for key in [key for key, (value, _) in self.entries.items() if predicate(value)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+class FileStore:
+    shared = True
+
+    def __init__(self, directory, max_entries=256, sweep_every=32):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.sweep_every = sweep_every
+        self.writes = count(1)
+
+    def path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest())
+
+    def load(self, path):
+        try:
+            with open(path, 'rb') as source:
+                return loads(source.read())
+        except OSError:
+            return None
+
+    def get(self, key):
+        item = self.load(self.path(key))
+        if item is None or item[0] != repr(key):
+            return None
+        if item[2] < time.time():
+            self.delete(key)
+            return None
+        return item[1]
+
+    def set(self, key, value, ttl):
+        expires = time.time() + ttl
+        data = dumps(key, value, expires)
+        os.makedirs(self.directory, exist_ok=True)
+        handle = tempfile.NamedTemporaryFile(dir=self.directory, prefix='.tmp-', delete=False)
+        with handle:
+            handle.write(data)
+        os.utime(handle.name, (expires, expires))
+        os.replace(handle.name, self.path(key))
+        if next(self.writes) % self.sweep_every == 0:
+            self.sweep()
+
+    def files(self):
+        files = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return files
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                files.append((os.stat(path).st_mtime, name, path))
+            except FileNotFoundError:
+                pass
+        return files
+
+    def sweep(self):
+        now = time.time()
+        entries = []
+        for expires, name, path in self.files():
+            if name.startswith('.tmp-'):
+                if expires < now - 3600:
+                    self.unlink(path)
+            elif expires < now:
+                self.unlink(path)
+            else:
+                entries.append((expires, path))
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_entries)]:
+            self.unlink(path)
+
+    def unlink(self, path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def delete(self, *keys):
+        for key in keys:
+            self.unlink(self.path(key))
+
+    def delete_matching(self, predicate):
+        for _, name, path in self.files():
+            if name.startswith('.tmp-'):
+                continue
+            item = self.load(path)
+            if item is not None and predicate(item[1]):
+                self.unlink(path)
+
+    def clear(self):
+        for _, _, path in self.files():
+            self.unlink(path)
+
+def tolerant(method):
+    @wraps(method)
+    def wrapper(self, *args):
+        try:
+            result = method(self, *args)
+        except redis.RedisError as error:
+            if not self.failing:
+                logger.error('Cache Redis indisponible, pages servies sans cache: %s', error)
+            self.failing = True
+            return None
+        if self.failing:
+            logger.warning('Cache Redis rétabli')
+            self.failing = False
+        return result
+    return wrapper
+
+class RedisStore:
+    shared = True
+
+    def __init__(self, url, prefix='bellari:'):
+        if redis is None:
+            raise RuntimeError('CACHE_BACKEND=redis nécessite le paquet redis')
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.prefix = prefix
+        self.failing = False
+
+    def name(self, key):
+        return self.prefix + hashlib.sha1(repr(key).encode()).hexdigest()
+
+    @tolerant
+    def get(self, key):
+        data = self.client.get(self.name(key))
+        if data is None:
+            return None
+        item = loads(data)
+        return item[1] if item is not None and item[0] == repr(key) else None
+
+    @tolerant
+    def set(self, key, value, ttl):
+        self.client.set(self.name(key), dumps(key, value), px=int(ttl * 1000))
+
+    @tolerant
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.name(key) for key in keys))
+
+    def delete_matching(self, predicate):
+        pass
+
+    @tolerant
+    def clear(self):
+        names = list(self.client.scan_iter(self.prefix + '*'))
+        if names:
+            self.client.delete(*names)
+
+def create_store(config):
+    backend = config['CACHE_BACKEND']
+    if backend == 'memory':
+        return MemoryStore(config['PAGE_CACHE_MAX_ENTRIES'])
+    if backend == 'filesystem':
+        return FileStore(config['CACHE_DIR'], config['PAGE_CACHE_MAX_ENTRIES'])
+    if backend == 'redis':
+        return RedisStore(config['CACHE_REDIS_URL'])
+    raise ValueError(f'CACHE_BACKEND inconnu: {backend}')
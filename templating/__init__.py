@@ -0,0 +1,119 @@
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from flask import request, has_request_context
+from flask.templating import Environment
+from jinja2 import FileSystemBytecodeCache
+
+class LazyBytecodeCache(FileSystemBytecodeCache):
+    def dump_bytecode(self, bucket):
+        os.makedirs(self.directory, exist_ok=True)
+        super().dump_bytecode(bucket)
+
+def bytecode_cache(app):
+    return LazyBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+
+def warm_templates(app):
+    started = time.perf_counter()
+    names = app.jinja_env.list_templates(extensions=['html', 'xml', 'txt'])
+    for name in names:
+        app.jinja_env.get_template(name)
+    app.logger.info('%d templates compilés en %.0f ms', len(names), (time.perf_counter() - started) * 1000)
+
+def source_fingerprint(app):
+    digest = hashlib.sha256()
+    env = app.jinja_env
+    for name in sorted(env.list_templates()):
+        digest.update(name.encode())
+        digest.update(env.loader.get_source(env, name)[0].encode())
+    manifest = os.path.join(app.static_folder, 'manifest.json')
+    if os.path.exists(manifest):
+        with open(manifest, 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+PERCENTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))
+
+def percentiles(samples, points=PERCENTILES):
+    ordered = sorted(samples)
+    return {name: round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3) for name, fraction in points}
+
+class RenderProfiler:
+    def __init__(self, max_samples=1000):
+        self.max_samples = max_samples
+        self.samples = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def record(self, key, total, own):
+        with self.lock:
+            self.samples[key].append((total, own))
+
+    def timed(self, render, template, block=None):
+        profiler = self
+
+        def generate(context):
+            stack = profiler.local.__dict__.setdefault('stack', [])
+            page = request.endpoint if has_request_context() else None
+            total = own = 0.0
+            chunks = render(context)
+            while True:
+                stack.append(0.0)
+                started = time.perf_counter()
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed = time.perf_counter() - started
+                    nested = stack.pop()
+                    total += elapsed
+                    own += elapsed - nested
+                    if stack:
+                        stack[-1] += elapsed
+                yield chunk
+            profiler.record((page, template, block), total, own)
+        return generate
+
+    def instrument(self, template):
+        if getattr(template, 'profiled', False):
+            return template
+        template.root_render_func = self.timed(template.root_render_func, template.name)
+        template.blocks = {name: self.timed(render, template.name, name) for name, render in template.blocks.items()}
+        template.profiled = True
+        return template
+
+    def report(self):
+        with self.lock:
+            items = [(key, list(samples)) for key, samples in self.samples.items()]
+        rows = []
+        for (page, template, block), samples in items:
+            rows.append({
+                'page': page,
+                'template': template,
+                'block': block,
+                'count': len(samples),
+                'total_ms': percentiles(total for total, own in samples),
+                'self_ms': percentiles(own for total, own in samples),
+            })
+        rows.sort(key=lambda row: row['self_ms']['p90'], reverse=True)
+        return rows
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+
+render_profiler = RenderProfiler()
+
+class ProfilingEnvironment(Environment):
+    def get_template(self, name, parent=None, globals=None):
+        template = super().get_template(name, parent, globals)
+        if self.app.config['TEMPLATE_PROFILE']:
+            render_profiler.instrument(template)
+        return template
+
+def init_templating(app):
+    app.jinja_environment = ProfilingEnvironment
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': bytecode_cache(app)}
@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import pytest
+
+WORKDIR = tempfile.mkdtemp(prefix='bellari-tests-')
+
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(WORKDIR, 'site.sqlite')}",
+    'DATABASE_REPLICA_URLS': '',
+    'PURGE_URL': 'stub',
+    'CACHE_BACKEND': 'memory',
+    'CACHE_BROADCAST': 'poll',
+    'CACHE_POLL_INTERVAL': '0.05',
+    'OUTBOX_TRANSPORT': 'fake',
+    'OUTBOX_FAKE_LOG': '',
+    'LOGIN_IP_BURST': '1000',
+    'SLOW_QUERY_LOG': '',
+    'TEMPLATE_CACHE_DIR': os.path.join(WORKDIR, 'jinja_cache'),
+    'CONTACT_SPOOL': os.path.join(WORKDIR, 'contact_spool.jsonl'),
+    'BOOTSTRAP_LOCK': os.path.join(WORKDIR, 'bootstrap.lock'),
+})
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app
+    from bootstrap import run_bootstrap
+    # Le seed génère les images des services dans static/images : on les écrit hors du dépôt.
+    cwd = os.getcwd()
+    os.chdir(WORKDIR)
+    try:
+        with app.app_context():
+            run_bootstrap()
+    finally:
+        os.chdir(cwd)
+    yield app
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+@pytest.fixture
+def purger(app):
+    purger = app.extensions['purger']
+    purger.take()
+    return purger
+
+@pytest.fixture
+def client(app, purger):
+    from cache import page_cache
+    page_cache.clear()
+    return app.test_client()
+
+@pytest.fixture
+def admin(app, purger):
+    client = app.test_client()
+    response = client.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 302
+    return client
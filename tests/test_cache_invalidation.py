@@ -0,0 +1,145 @@
+import pickle
+import time
+from datetime import datetime
+import pytest
+from flask import g
+from sqlalchemy import insert, update
+from broadcast import version_broadcast
+from cache import PageCache, page_cache
+from models import db, CacheVersion
+from stores import MemoryStore, FileStore, RedisStore
+
+def fetch(client, path, **headers):
+    response = client.get(path, headers=headers)
+    response.data
+    return response
+
+def wait_for(condition, timeout=3):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+def cached_with(tag):
+    return [key for key, (entry, _) in list(page_cache.store.entries.items()) if tag in entry['tags']]
+
+def bump_elsewhere(app, name):
+    # Simule un autre worker : écriture directe, sans passer par la session ni ses listeners.
+    with app.app_context(), db.engine.begin() as connection:
+        values = {'version': CacheVersion.version + 1, 'updated_at': datetime.utcnow()}
+        if not connection.execute(update(CacheVersion).where(CacheVersion.name == name).values(values)).rowcount:
+            connection.execute(insert(CacheVersion).values(name=name, version=1, updated_at=datetime.utcnow()))
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryStore(max_entries=2)
+    store.set('a', 1, 60)
+    store.set('b', 2, 60)
+    store.get('a')
+    store.set('c', 3, 60)
+    assert store.get('a') == 1
+    assert store.get('b') is None
+    assert store.get('c') == 3
+
+def test_memory_store_expires_entries():
+    store = MemoryStore()
+    store.set('a', 1, -1)
+    assert store.get('a') is None
+
+def test_file_store_is_shared_between_workers(tmp_path):
+    first, second = FileStore(str(tmp_path)), FileStore(str(tmp_path))
+    first.set('page', {'tags': {'services': 1}}, 60)
+    assert second.get('page') == {'tags': {'services': 1}}
+    second.delete_matching(lambda entry: 'services' in entry['tags'])
+    assert first.get('page') is None
+
+def test_file_store_caps_entries(tmp_path):
+    store = FileStore(str(tmp_path), max_entries=3, sweep_every=4)
+    for index in range(7):
+        store.set(f'page-{index}', {'tags': {}}, 60)
+    assert len(store.files()) == 6
+    store.set('page-7', {'tags': {}}, 60)
+    assert len(store.files()) == 3
+    assert store.get('page-7') is not None
+
+PAGE = {
+    'body': b'<html>\xc3\xa9t\xc3\xa9</html>',
+    'mimetype': 'text/html',
+    'headers': {'ETag': '"abc"'},
+    'tags': {'settings': 3, 'service-1': 1},
+    'encodings': {'gzip': b'\x1f\x8b\x08\x00'},
+}
+
+class Exploit:
+    def __reduce__(self):
+        return (open, (MARKER, 'w'))
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def set(self, name, value, px=None):
+        self.data[name] = value
+
+def test_file_store_round_trips_page_entries(tmp_path):
+    store = FileStore(str(tmp_path))
+    key = ('localhost', 'service_detail', (('id', 1),), b'')
+    store.set(key, PAGE, 60)
+    assert store.get(key) == PAGE
+    assert store.get(('localhost', 'service_detail', (('id', 2),), b'')) is None
+
+def test_file_store_never_unpickles(tmp_path):
+    global MARKER
+    MARKER = str(tmp_path / 'pwned')
+    store = FileStore(str(tmp_path / 'cache'))
+    store.set('page', PAGE, 60)
+    with open(store.path('page'), 'wb') as target:
+        pickle.dump(('page', Exploit(), time.time() + 60), target)
+    assert store.get('page') is None
+    store.delete_matching(lambda entry: True)
+    assert not (tmp_path / 'pwned').exists()
+
+def test_redis_store_round_trips_page_entries():
+    pytest.importorskip('redis')
+    store = RedisStore('redis://localhost:1/0')
+    store.client = FakeRedis()
+    store.set('page', PAGE, 60)
+    assert store.get('page') == PAGE
+    store.client.data[store.name('page')] = pickle.dumps(('page', PAGE))
+    assert store.get('page') is None
+
+def test_cached_entry_rejected_after_version_change(app):
+    cache = PageCache(MemoryStore())
+    with app.test_request_context():
+        g.cache_versions, g.cache_modified = {'services': 1, 'settings': 4}, {}
+        cache.set('page', b'<html></html>', 'text/html', ['services', 'settings'])
+        assert cache.get('page')['tags'] == {'services': 1, 'settings': 4}
+        g.cache_versions = {'services': 2, 'settings': 4}
+        assert cache.get('page') is None
+    assert cache.store.entries == {}
+
+def test_bump_from_another_worker_invalidates_cache(app, client):
+    etag = fetch(client, '/service/1').headers['ETag']
+    assert wait_for(lambda: version_broadcast.snapshot() is not None)
+    assert cached_with('service-1')
+    assert fetch(client, '/service/1', **{'If-None-Match': etag}).status_code == 304
+
+    bump_elsewhere(app, 'service-1')
+
+    assert wait_for(lambda: not cached_with('service-1'))
+    response = fetch(client, '/service/1', **{'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert cached_with('service-1')
+
+def test_unrelated_bump_keeps_cache(app, client):
+    fetch(client, '/service/1')
+    assert wait_for(lambda: version_broadcast.snapshot() is not None)
+    before = version_broadcast.snapshot()[0].get('testimonials')
+    bump_elsewhere(app, 'testimonials')
+    assert wait_for(lambda: version_broadcast.snapshot()[0].get('testimonials') != before)
+    assert cached_with('service-1')
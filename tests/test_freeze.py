@@ -0,0 +1,51 @@
+import os
+import time
+from cache import invalidate
+from freeze import freeze, refreezer
+from models import db, Service
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+def frozen(root, name):
+    try:
+        with open(os.path.join(root, 'current', name), encoding='utf-8') as page:
+            return page.read()
+    except FileNotFoundError:
+        return ''
+
+def test_admin_commit_refreezes_changed_pages(app, admin, tmp_path, monkeypatch):
+    root = str(tmp_path / 'site')
+    monkeypatch.setitem(app.config, 'FREEZE_DIR', root)
+    monkeypatch.setitem(app.config, 'FREEZE_AUTO', True)
+    monkeypatch.setitem(app.config, 'FREEZE_DELAY', 0)
+    with app.app_context():
+        freeze()
+        service = db.session.get(Service, 2)
+        form = {'title': 'Vitres et façades', 'description': service.description, 'icon': service.icon, 'order': str(service.order)}
+    assert 'Vitres et façades' not in frozen(root, 'service/2/index.html')
+
+    assert admin.post('/admin/services/2/edit', data=form).status_code == 302
+    assert wait_for(lambda: 'Vitres et façades' in frozen(root, 'service/2/index.html'))
+    assert wait_for(lambda: refreezer.timer is None)
+
+def test_rollback_does_not_refreeze(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'FREEZE_AUTO', True)
+    monkeypatch.setitem(app.config, 'FREEZE_DELAY', 60)
+    with app.app_context():
+        invalidate('testimonials')
+        db.session.rollback()
+        db.session.commit()
+    assert refreezer.timer is None
+
+def test_refreeze_is_off_by_default(app):
+    assert not app.config['FREEZE_AUTO']
+    with app.app_context():
+        invalidate('testimonials')
+        db.session.commit()
+    assert refreezer.timer is None
@@ -0,0 +1,89 @@
+from cache import invalidate, page_cache
+from models import db, Service
+
+def fetch(client, path, **headers):
+    response = client.get(path, headers=headers)
+    response.data
+    return response
+
+def test_public_page_carries_validators_and_surrogate_keys(client):
+    response = fetch(client, '/service/1')
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert response.headers['Last-Modified']
+    assert response.headers['Surrogate-Key'] == 'settings images service-1'
+    assert response.headers['Cache-Tag'] == 'settings,images,service-1'
+    assert response.cache_control.public
+    assert response.cache_control.must_revalidate
+
+def test_if_none_match_returns_304(client):
+    etag = fetch(client, '/service/1').headers['ETag']
+    response = fetch(client, '/service/1', **{'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+    assert response.headers['Surrogate-Key'] == 'settings images service-1'
+
+def test_if_none_match_accepts_encoded_etag(client):
+    first = fetch(client, '/services', **{'Accept-Encoding': 'gzip'})
+    assert first.headers['Content-Encoding'] == 'gzip'
+    response = fetch(client, '/services', **{'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == first.headers['ETag']
+
+def test_if_modified_since_returns_304(client):
+    modified = fetch(client, '/service/1').headers['Last-Modified']
+    response = fetch(client, '/service/1', **{'If-Modified-Since': modified})
+    assert response.status_code == 304
+
+def test_conditional_get_on_cold_cache_renders_then_304(client):
+    etag = fetch(client, '/service/1').headers['ETag']
+    page_cache.clear()
+    response = fetch(client, '/service/1', **{'If-None-Match': etag})
+    assert response.status_code == 304
+    assert fetch(client, '/service/1').headers['ETag'] == etag
+
+def test_missing_page_is_404_despite_validators(client):
+    response = fetch(client, '/service/9999', **{'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+    assert response.status_code == 404
+    response = fetch(client, '/service/9999', **{'If-None-Match': '*'})
+    assert response.status_code == 404
+
+def test_stale_etag_gets_full_page(client):
+    response = fetch(client, '/service/1', **{'If-None-Match': '"perime"'})
+    assert response.status_code == 200
+    assert response.data
+
+def test_admin_pages_are_private(admin):
+    response = fetch(admin, '/service/1')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+    assert 'Surrogate-Key' not in response.headers
+    assert response.cache_control.private
+    assert response.cache_control.no_store
+
+def test_admin_edit_purges_tags_and_changes_etag(client, admin, purger):
+    etag = fetch(client, '/service/1').headers['ETag']
+    with client.application.app_context():
+        service = db.session.get(Service, 1)
+        form = {'title': service.title, 'description': service.description, 'icon': service.icon, 'order': str(service.order)}
+    response = admin.post('/admin/services/1/edit', data=form)
+    assert response.status_code == 302
+    assert purger.take() == [['service-1', 'services']]
+    response = fetch(client, '/service/1', **{'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_purge_waits_for_commit(app, purger):
+    with app.app_context():
+        invalidate('testimonials')
+        assert purger.take() == []
+        db.session.commit()
+    assert purger.take() == [['testimonials']]
+
+def test_rollback_discards_purge(app, purger):
+    with app.app_context():
+        invalidate('testimonials')
+        db.session.rollback()
+        db.session.commit()
+    assert purger.take() == []
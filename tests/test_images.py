@@ -0,0 +1,47 @@
+import glob
+from PIL import Image
+from cache import invalidate
+from models import db
+import utils
+from utils import IMAGE_WIDTHS, generate_variants, image_srcset, variant_formats, variant_widths
+
+def test_variant_widths_stop_at_source_width():
+    assert variant_widths(300) == [300]
+    assert variant_widths(900) == [480, 768, 900]
+    assert variant_widths(1600) == [480, 768, 1024, 1600]
+
+def test_wide_source_encodes_each_width_once():
+    assert variant_widths(2000) == list(IMAGE_WIDTHS)
+
+def test_wide_upload_writes_one_file_per_variant(tmp_path):
+    path = tmp_path / 'chantier.jpg'
+    Image.new('RGB', (2000, 1000), (52, 165, 224)).save(path)
+    created = generate_variants(str(path))
+    assert len(created) == len(set(created)) == len(IMAGE_WIDTHS) * len(variant_formats())
+    for name in created:
+        assert (tmp_path / name).is_file()
+
+def test_srcset_scans_variants_once_per_images_version(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'static_folder', str(tmp_path))
+    (tmp_path / 'images').mkdir()
+    path = tmp_path / 'images' / 'equipe.jpg'
+    Image.new('RGB', (900, 600), (14, 165, 233)).save(path)
+    scans = []
+    real_glob = glob.glob
+    monkeypatch.setattr(utils.glob, 'glob', lambda pattern: scans.append(pattern) or real_glob(pattern))
+
+    with app.test_request_context():
+        assert image_srcset('equipe.jpg', 'webp') == ''
+        generate_variants(str(path))
+        assert image_srcset('equipe.jpg', 'webp') == ''
+    assert len(scans) == 1
+
+    with app.app_context():
+        invalidate('images')
+        db.session.commit()
+    with app.test_request_context():
+        srcset = image_srcset('equipe.jpg', 'webp')
+        assert image_srcset('equipe.jpg', 'webp') == srcset
+    assert len(scans) == 2
+    assert [entry.rsplit(' ', 1)[1] for entry in srcset.split(', ')] == ['480w', '768w', '900w']
+    assert 'variants/equipe-480.webp' in srcset
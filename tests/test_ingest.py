@@ -0,0 +1,37 @@
+import sys
+import threading
+import pytest
+from ingest import ContactIngest
+
+@pytest.fixture
+def ingest(app):
+    ingest = ContactIngest()
+    ingest.app = app
+    return ingest
+
+@pytest.fixture
+def busy_switching():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+def hammer(target, threads=8):
+    barrier = threading.Barrier(threads)
+    def run():
+        barrier.wait()
+        target()
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+def test_counters_stay_exact_under_threads(app, ingest, busy_switching):
+    burst = app.config['CONTACT_BURST']
+    hammer(lambda: [ingest.submit({}, f'10.0.0.{index}') for index in range(200)])
+    hammer(lambda: [ingest.submit({}, '10.0.1.1') for _ in range(500)])
+    counters = ingest.snapshot()
+    assert counters['rejected'] == 200 * burst + burst
+    assert counters['throttled'] == 200 * (8 - burst) + 8 * 500 - burst
+    assert counters['accepted'] == 0
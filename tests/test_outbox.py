@@ -0,0 +1,181 @@
+import threading
+from datetime import datetime, timedelta
+import pytest
+import outbox
+from models import db, OutboxMessage
+from outbox import Dispatcher, FakeTransport, PermanentError, backoff, enqueue, retry_failed
+
+class RejectingTransport:
+    def send(self, key, payload):
+        raise PermanentError('Destinataire refusé')
+
+@pytest.fixture
+def fake():
+    return FakeTransport()
+
+@pytest.fixture
+def dispatcher(app, fake):
+    with app.app_context():
+        OutboxMessage.query.delete()
+        db.session.commit()
+    return Dispatcher(app, {'whatsapp': fake, 'email': fake})
+
+def queue(app, key='quote-1-email', channel='email'):
+    with app.app_context():
+        enqueue(channel, key, {'to': 'contact@example.com', 'subject': 'Devis', 'body': 'Bonjour'})
+        db.session.commit()
+
+def row(app, key='quote-1-email'):
+    with app.app_context():
+        message = OutboxMessage.query.filter_by(idempotency_key=key).one()
+        db.session.expunge(message)
+        return message
+
+def make_due(app, key='quote-1-email'):
+    with app.app_context():
+        OutboxMessage.query.filter_by(idempotency_key=key).update({OutboxMessage.available_at: datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+
+def test_delivers_pending_message(app, dispatcher, fake):
+    queue(app)
+    assert dispatcher.dispatch_batch() == 1
+    assert fake.sent == [('quote-1-email', {'to': 'contact@example.com', 'subject': 'Devis', 'body': 'Bonjour'})]
+    message = row(app)
+    assert message.status == 'sent'
+    assert message.attempts == 1
+    assert message.sent_at is not None
+    assert message.locked_until is None
+
+def test_failure_is_retried_after_backoff(app, dispatcher, fake):
+    fake.failures = 1
+    queue(app)
+    dispatcher.dispatch_batch()
+    message = row(app)
+    assert fake.sent == []
+    assert message.status == 'pending'
+    assert message.attempts == 1
+    assert message.last_error == 'Échec simulé'
+    delay = (message.available_at - datetime.utcnow()).total_seconds()
+    assert app.config['OUTBOX_BACKOFF_BASE'] * 0.5 - 1 <= delay <= app.config['OUTBOX_BACKOFF_BASE']
+
+    assert dispatcher.dispatch_batch() == 0
+    make_due(app)
+    assert dispatcher.dispatch_batch() == 1
+    message = row(app)
+    assert [key for key, _ in fake.sent] == ['quote-1-email']
+    assert message.status == 'sent'
+    assert message.attempts == 2
+    assert message.last_error is None
+
+def test_backoff_doubles_with_jitter_and_is_capped():
+    config = {'OUTBOX_BACKOFF_BASE': 30, 'OUTBOX_BACKOFF_MAX': 3600}
+    for attempts, ceiling in ((1, 30), (2, 60), (3, 120), (7, 1920), (8, 3600), (20, 3600)):
+        for _ in range(50):
+            assert ceiling / 2 <= backoff(config, attempts) <= ceiling
+
+def test_permanent_error_fails_at_once(app, dispatcher):
+    dispatcher.transports['email'] = RejectingTransport()
+    queue(app)
+    dispatcher.dispatch_batch()
+    message = row(app)
+    assert message.status == 'failed'
+    assert message.attempts == 1
+    assert message.last_error == 'Destinataire refusé'
+
+def test_gives_up_after_max_attempts(app, dispatcher, fake, monkeypatch):
+    monkeypatch.setitem(app.config, 'OUTBOX_MAX_ATTEMPTS', 3)
+    fake.failures = 10
+    queue(app)
+    for attempt in range(1, 4):
+        make_due(app)
+        dispatcher.dispatch_batch()
+        assert row(app).attempts == attempt
+    message = row(app)
+    assert message.status == 'failed'
+    make_due(app)
+    assert dispatcher.dispatch_batch() == 0
+    assert fake.sent == []
+
+    fake.failures = 0
+    with app.app_context():
+        assert retry_failed() == 1
+        db.session.commit()
+    dispatcher.dispatch_batch()
+    assert row(app).status == 'sent'
+    assert len(fake.sent) == 1
+
+def test_row_is_claimed_by_a_single_dispatcher(app, dispatcher, fake):
+    other = Dispatcher(app, {'whatsapp': fake, 'email': fake})
+    queue(app)
+    with app.app_context():
+        due = dispatcher.due()
+        assert other.due() == due
+        assert dispatcher.claim(*due[0]) is not None
+        assert other.claim(*due[0]) is None
+        assert other.due() == []
+
+def test_losing_dispatcher_reports_no_work_and_sleeps(app, dispatcher, fake, monkeypatch):
+    other = Dispatcher(app, {'whatsapp': fake, 'email': fake})
+    queue(app)
+    with app.app_context():
+        stale = dispatcher.due()
+        claimed = dispatcher.claim(*stale[0])
+    monkeypatch.setattr(other, 'due', lambda: stale)
+    assert other.dispatch_batch() == 0
+    assert fake.sent == []
+
+    sleeps = []
+    real_sleep = outbox.time.sleep
+    def sleep(seconds):
+        if threading.current_thread() is not worker:
+            return real_sleep(seconds)
+        sleeps.append(seconds)
+        other.stop()
+    monkeypatch.setattr(outbox.time, 'sleep', sleep)
+    worker = threading.Thread(target=other.run)
+    worker.start()
+    worker.join(5)
+    assert not worker.is_alive()
+    assert sleeps == [app.config['OUTBOX_POLL_INTERVAL']]
+
+    with app.app_context():
+        assert dispatcher.deliver(*claimed)
+    assert [key for key, _ in fake.sent] == ['quote-1-email']
+
+def test_expired_lease_is_taken_over(app, dispatcher, fake):
+    queue(app)
+    with app.app_context():
+        dispatcher.claim(*dispatcher.due()[0])
+        OutboxMessage.query.update({OutboxMessage.locked_until: datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+    assert dispatcher.dispatch_batch() == 1
+    message = row(app)
+    assert message.status == 'sent'
+    assert message.attempts == 2
+    assert len(fake.sent) == 1
+
+def test_unconfigured_channel_stays_pending(app, dispatcher, fake):
+    email_only = Dispatcher(app, {'email': fake})
+    queue(app, 'quote-1-whatsapp', 'whatsapp')
+    assert email_only.dispatch_batch() == 0
+    assert row(app, 'quote-1-whatsapp').status == 'pending'
+    assert fake.sent == []
+
+def test_quote_request_is_notified_once(app, client, dispatcher, fake, monkeypatch):
+    monkeypatch.setitem(app.config, 'NOTIFY_WHATSAPP_TO', '+33 6 00 00 00 00')
+    monkeypatch.setitem(app.config, 'NOTIFY_EMAIL_TO', 'contact@example.com')
+    response = client.post('/devis', data={
+        'name': 'Jeanne Martin',
+        'phone': '0600000000',
+        'service': 'Nettoyage de bureau',
+        'address': '1 rue de la Paix, Paris',
+    })
+    assert response.status_code == 302
+    assert dispatcher.dispatch_batch() == 2
+    assert dispatcher.dispatch_batch() == 0
+    keys = sorted(key for key, _ in fake.sent)
+    assert len(keys) == 2
+    assert keys[0].endswith('-email') and keys[1].endswith('-whatsapp')
+    whatsapp = dict(fake.sent)[keys[1]]
+    assert whatsapp['to'] == '+33 6 00 00 00 00'
+    assert '*Nom:* Jeanne Martin' in whatsapp['text']
@@ -1,6 +1,19 @@
-from PIL import Image, ImageDraw
+from PIL import Image, ImageDraw, ImageOps, features
+from markupsafe import Markup
+from flask import current_app, url_for
 import random
+import glob
+import json
+import base64
+import io
 import os
+import re
+
+IMAGE_WIDTHS = (480, 768, 1024, 1600)
+VARIANT_FORMATS = ('avif', 'webp')
+VARIANT_QUALITY = {'avif': 55, 'webp': 80}
+PLACEHOLDER_WIDTH = 16
+RASTER_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
 
 def generate_random_image(width=600, height=400, filename='generated.jpg'):
     colors = [
@@ -24,7 +37,192 @@ def generate_random_image(width=600, height=400, filename='generated.jpg'):
     img.save(path)
     return f'/static/images/{filename}'
 
+class Snapshot:
+    def __init__(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is read-only')
+
+    @classmethod
+    def of(cls, row):
+        return cls(**{column.name: getattr(row, column.name) for column in row.__table__.columns})
+
+_settings_cache = (None, None)
+
+def variant_formats():
+    return [fmt for fmt in VARIANT_FORMATS if features.check(fmt)]
+
+def variant_name(filename, width, fmt):
+    stem = filename.rsplit('.', 1)[0]
+    return f'variants/{stem}-{width}.{fmt}'
+
+def variant_widths(width):
+    widths = [w for w in IMAGE_WIDTHS if w < width]
+    if width <= IMAGE_WIDTHS[-1]:
+        widths.append(width)
+    return widths
+
+def generate_variants(path):
+    filename = os.path.basename(path)
+    if filename.rsplit('.', 1)[-1].lower() not in RASTER_EXTENSIONS:
+        return []
+    folder = os.path.dirname(path)
+    created = []
+    with Image.open(path) as source:
+        img = ImageOps.exif_transpose(source)
+        img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+        for width in variant_widths(img.width):
+            height = round(img.height * width / img.width)
+            resized = img.resize((width, height), Image.LANCZOS) if width != img.width else img
+            for fmt in variant_formats():
+                name = variant_name(filename, width, fmt)
+                target = os.path.join(folder, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                resized.save(target, fmt.upper(), quality=VARIANT_QUALITY[fmt])
+                created.append(name)
+    return created
+
+def image_placeholder(path):
+    filename = os.path.basename(path)
+    if filename.rsplit('.', 1)[-1].lower() not in RASTER_EXTENSIONS:
+        return None
+    with Image.open(path) as source:
+        img = ImageOps.exif_transpose(source)
+        info = {'width': img.width, 'height': img.height, 'color': None, 'placeholder': None}
+        if 'A' in img.getbands() and img.getchannel('A').getextrema()[0] < 255:
+            return info
+        img = img.convert('RGB')
+        palette = img.resize((64, 64), Image.BILINEAR).quantize(colors=5)
+        count, index = max(palette.getcolors())
+        info['color'] = '#{:02x}{:02x}{:02x}'.format(*palette.getpalette()[index * 3:index * 3 + 3])
+        height = max(1, round(img.height * PLACEHOLDER_WIDTH / img.width))
+        preview = io.BytesIO()
+        img.resize((PLACEHOLDER_WIDTH, height), Image.LANCZOS).save(preview, 'WEBP', quality=40)
+        info['placeholder'] = base64.b64encode(preview.getvalue()).decode('ascii')
+    return info
+
+def process_image(path):
+    return {'variants': generate_variants(path), 'info': image_placeholder(path)}
+
+def find_variants(filename, fmt):
+    folder = os.path.join(current_app.static_folder, 'images')
+    pattern = os.path.join(folder, glob.escape(variant_name(filename, 0, fmt)).replace('-0.', '-*.'))
+    entries = []
+    stem = os.path.basename(filename).rsplit('.', 1)[0]
+    for path in glob.glob(pattern):
+        prefix, width = os.path.basename(path)[:-len(fmt) - 1].rsplit('-', 1)
+        if prefix == stem and width.isdigit():
+            entries.append((int(width), os.path.relpath(path, folder).replace(os.sep, '/')))
+    return sorted(entries)
+
+_variants_cache = (None, {})
+
+def image_variants(filename, fmt):
+    global _variants_cache
+    from cache import get_version
+    version = get_version('images')
+    cached_version, variants = _variants_cache
+    if cached_version != version:
+        variants = {}
+        _variants_cache = (version, variants)
+    if (filename, fmt) not in variants:
+        variants[filename, fmt] = find_variants(filename, fmt)
+    return variants[filename, fmt]
+
+def image_srcset(filename, fmt):
+    return ', '.join(f"{url_for('static', filename='images/' + name)} {width}w" for width, name in image_variants(filename, fmt))
+
+def image_attrs(filename, priority=False):
+    info = get_image_info().get(filename)
+    attrs = {'loading': 'eager' if priority else 'lazy', 'decoding': 'async'}
+    if priority:
+        attrs['fetchpriority'] = 'high'
+    if info is not None:
+        if info.width and info.height:
+            attrs.update(width=info.width, height=info.height)
+        if info.placeholder:
+            attrs['style'] = f'background:{info.color} url(data:image/webp;base64,{info.placeholder}) center/cover no-repeat'
+        elif info.color:
+            attrs['style'] = f'background:{info.color}'
+    return Markup(' ').join(Markup('{}="{}"').format(name, value) for name, value in attrs.items())
+
+def responsive_image(filename, alt='', sizes='100vw', class_='', priority=False):
+    src = url_for('static', filename='images/' + filename)
+    img = Markup('<img src="{}" alt="{}" class="{}" {}>').format(src, alt, class_, image_attrs(filename, priority))
+    sources = []
+    for fmt in variant_formats():
+        srcset = image_srcset(filename, fmt)
+        if srcset:
+            sources.append(Markup('<source type="image/{}" srcset="{}" sizes="{}">').format(fmt, srcset, sizes))
+    if not sources:
+        return img
+    return Markup('<picture>{}{}</picture>').format(Markup('').join(sources), img)
+
+_manifest_cache = (None, {}, frozenset())
+
+def load_manifest():
+    global _manifest_cache
+    path = os.path.join(current_app.static_folder, 'manifest.json')
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return {}, frozenset()
+    cached_mtime, manifest, hashed = _manifest_cache
+    if cached_mtime != mtime:
+        with open(path) as source:
+            manifest = json.load(source)
+        hashed = frozenset(manifest.values())
+        _manifest_cache = (mtime, manifest, hashed)
+    return manifest, hashed
+
+def asset_manifest():
+    return load_manifest()[0]
+
+def is_fingerprinted(filename):
+    return filename in load_manifest()[1]
+
+def asset_url(logical):
+    return url_for('static', filename=logical) if logical in asset_manifest() else None
+
+def rgb_channels(color):
+    color = (color or '').lstrip('#')
+    try:
+        return ' '.join(str(int(color[i:i + 2], 16)) for i in (0, 2, 4))
+    except ValueError:
+        return '0 0 0'
+
 def get_settings():
+    global _settings_cache
+    from cache import get_version
+    version = get_version('settings')
+    cached_version, snapshot = _settings_cache
+    if snapshot is None or cached_version != version:
+        snapshot = Snapshot.of(load_settings())
+        _settings_cache = (version, snapshot)
+    return snapshot
+
+_image_info_cache = (None, {})
+
+def get_image_info():
+    global _image_info_cache
+    from cache import get_version
+    version = get_version('images')
+    cached_version, infos = _image_info_cache
+    if cached_version != version:
+        from models import ImageInfo
+        infos = {row.filename: Snapshot.of(row) for row in ImageInfo.query.all()}
+        _image_info_cache = (version, infos)
+    return infos
+
+def store_image_info(filename, info):
+    from models import db, ImageInfo
+    if info is None:
+        return None
+    return db.session.merge(ImageInfo(filename=filename, **info))
+
+def load_settings():
     from models import SiteSettings
     settings = SiteSettings.query.first()
     if not settings:
@@ -33,3 +231,29 @@ def get_settings():
         db.session.add(settings)
         db.session.commit()
     return settings
+
+def image_filename(value):
+    if value and value.startswith('/static/images/'):
+        return value[len('/static/images/'):]
+    return value
+
+TEMPLATE_IMAGE = re.compile(r'''['"]([^'"/]+\.(?:png|jpe?g|gif|webp|svg))['"]''', re.IGNORECASE)
+
+def template_images():
+    env = current_app.jinja_env
+    filenames = set()
+    for name in env.list_templates(extensions=['html']):
+        source = env.loader.get_source(env, name)[0]
+        filenames.update(TEMPLATE_IMAGE.findall(source))
+    return filenames
+
+def referenced_images():
+    from models import Service, SiteSettings, SEOSettings, SiteImage, Testimonial
+    filenames = template_images()
+    filenames.update(image for (image,) in Service.query.with_entities(Service.image))
+    filenames.update(image for (image,) in Testimonial.query.with_entities(Testimonial.image))
+    for settings in SiteSettings.query.all():
+        filenames.update((settings.hero_image, settings.about_image, settings.logo_image, settings.favicon))
+    filenames.update(image for (image,) in SEOSettings.query.with_entities(SEOSettings.meta_image))
+    filenames.update(image for (image,) in SiteImage.query.with_entities(SiteImage.filename))
+    return {image_filename(name) for name in filenames if name}